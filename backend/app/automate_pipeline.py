@@ -1,15 +1,17 @@
 import imaplib
-import email
-from email.header import decode_header
-import re
 import json
+from itertools import chain
 import os
-from typing import List, Dict
-from email.utils import parsedate_to_datetime
+from typing import Iterator, List, Dict, Optional
 
-from app.sentiment_priority import classify_email, sort_emails_by_priority, analyze_sentiment, assign_priority
+from app.classifier import classify_email
 from app.extraction.info_extract import extract_info  # uses your existing extractor
+from app.extraction.parallel import ExtractionPool
+from app.extraction.profiles import CONTACT_FIELDS, SenderProfiles
 from app import db
+from app.spool import Spool
+from app.emails.stream import MAX_CHUNK_BYTES, MailRecord, chunked, iter_messages, parse_message
+from app.emails.triage import TriagePolicy, TriageReport, iter_triaged, skipped_record
 
 # load credentials.json (app/credentials.json)
 CREDS_PATH = os.path.join(os.path.dirname(__file__), "credentials.json")
@@ -19,161 +21,164 @@ EMAIL_USER = creds["email_user"]
 EMAIL_PASS = creds["email_pass"]
 IMAP_HOST = creds.get("imap_host", "imap.gmail.com")
 IMAP_PORT = creds.get("imap_port", 993)
+# addresses or "@domain" entries; allowlisted senders are never triaged away
+SENDER_ALLOWLIST = creds.get("sender_allowlist", [])
+SENDER_DENYLIST = creds.get("sender_denylist", [])
 
-def clean_text(text: str) -> str:
-    return re.sub(r"\s+", " ", text or "").strip()
-
-def fetch_emails(n: int = 50) -> List[Dict]:
+def iter_emails(n: Optional[int] = 50, spool: Optional[Spool] = None,
+                max_bytes: int = MAX_CHUNK_BYTES, triage: Optional[TriagePolicy] = None,
+                report: Optional[TriageReport] = None) -> Iterator[MailRecord]:
     """
-    Fetch last n messages via IMAP and return list of dicts with:
-    id (Message-ID), subject, sender, body, date
+    Stream the last n messages (all of them if n is falsy) via IMAP, newest
+    first, as MailRecords: id (Message-ID), subject, sender, body, date.
+    Messages are fetched in chunks of at most max_bytes raw bytes.
+    If a spool is given, the raw message bytes are appended to it as well.
+    With a triage policy, headers are fetched first: messages already in the
+    DB are left out, and messages it skips come back body-less with `triage`
+    set (and are not spooled).
     """
-    mails = []
     imap = imaplib.IMAP4_SSL(IMAP_HOST, IMAP_PORT)
     imap.login(EMAIL_USER, EMAIL_PASS)
-    imap.select("INBOX")
+    try:
+        imap.select("INBOX")
+
+        status, data = imap.search(None, "ALL")
+        if status != "OK":
+            return
 
-    status, data = imap.search(None, "ALL")
-    if status != "OK":
+        ids = data[0].split()
+        latest = ids[-n:] if n and len(ids) >= n else ids
+        if triage is not None:
+            yield from iter_triaged(imap, latest[::-1], triage, max_bytes, spool, report, db.stored_ids)
+        else:
+            yield from iter_messages(imap, latest[::-1], max_bytes, spool)
+    finally:
         imap.logout()
-        return mails
 
-    ids = data[0].split()
-    latest = ids[-n:] if len(ids) >= n else ids
+def fetch_emails(n: int = 50, spool: Optional[Spool] = None) -> List[Dict]:
+    """
+    Fetch last n messages via IMAP and return list of dicts with:
+    id (Message-ID), subject, sender, body, date
+    Prefer iter_emails() for anything larger than a screenful.
+    """
+    return [record.to_dict() for record in iter_emails(n, spool)]
 
-    for mid in reversed(latest):
-        status, msg_data = imap.fetch(mid, "(RFC822)")
-        if status != "OK":
-            continue
-        raw = msg_data[0][1]
-        msg = email.message_from_bytes(raw)
-
-        # Message-ID (unique)
-        msg_id = msg.get("Message-ID") or msg.get("Message-Id") or f"<local-{mid.decode()}>"
-
-        # Subject
-        subject_raw = msg.get("Subject", "") or ""
-        subject, enc = decode_header(subject_raw)[0]
-        if isinstance(subject, bytes):
-            subject = subject.decode(enc or "utf-8", errors="ignore")
-        subject = clean_text(subject)
-
-        # From
-        sender = msg.get("From", "")
-
-        # Date
-        date_raw = msg.get("Date", "") or ""
-        date_str = date_raw
-
-        # Body (prefer text/plain)
-        body = ""
-        if msg.is_multipart():
-            for part in msg.walk():
-                ctype = part.get_content_type()
-                cdisp = str(part.get("Content-Disposition") or "")
-                if ctype == "text/plain" and "attachment" not in cdisp.lower():
-                    try:
-                        body = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
-                        break
-                    except Exception:
-                        body = ""
-            # if still empty, try html part fallback
-            if not body:
-                for part in msg.walk():
-                    if part.get_content_type() == "text/html":
-                        try:
-                            body = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
-                            break
-                        except Exception:
-                            body = ""
-        else:
-            try:
-                body = msg.get_payload(decode=True).decode(msg.get_content_charset() or "utf-8", errors="ignore")
-            except Exception:
-                body = ""
-
-        mails.append({
-            "id": msg_id.strip(),
-            "subject": subject,
-            "sender": sender,
-            "date": date_str,
-            "body": clean_text(body)
-        })
 
-    imap.logout()
-    return mails
+def build_record(mail: Dict) -> Dict:
+    """
+    Classify one fetched email and extract structured info from it.
+    Runs inside ExtractionPool workers, so it must stay a module-level function.
+    `mail["profile"]`, if set, is the sender's stored profile; the contact
+    fields extracted come back under "extracted" for updating it.
+    """
+    # classify (type, sentiment, priority)
+    classified = classify_email(mail.copy())  # returns mail updated with type/sentiment/priority
 
+    # ensure sentiment and priority exist (classify_email handles that)
+    sentiment = classified.get("sentiment", "Neutral")
+    priority = classified.get("priority", "Not Urgent")
 
-def run_pipeline(fetch_n: int = 100):
+    # info extraction (phone, alternate email, requirements or summary)
+    try:
+        info = extract_info({
+            "subject": classified.get("subject"),
+            "snippet": (classified.get("body") or "")[:200],
+            "body": classified.get("body"),
+            "type": classified.get("type"),
+            "profile": mail.get("profile")
+        })
+        phone = info.get("phone") or None
+        alt_email = info.get("alternate_email") or info.get("email") or None
+        requirements = info.get("requirements") or info.get("summary") or None
+        extracted = {k: info.get(k) for k in CONTACT_FIELDS}
+        extraction_failed = False
+    except Exception as e:
+        phone = None
+        alt_email = None
+        requirements = None
+        extracted = None
+        # keeps update_analysis from overwriting stored values with these Nones
+        extraction_failed = True
+
+    # Build record for DB
+    return {
+        "id": classified["id"],
+        "sender": classified.get("sender"),
+        "subject": classified.get("subject"),
+        "body": classified.get("body"),
+        "date": classified.get("date"),
+        "type": classified.get("type"),
+        "sentiment": sentiment,
+        "priority": priority,
+        "phone": phone,
+        "alt_email": alt_email,
+        "requirements": requirements,
+        "draft_response": None,
+        "extracted": extracted,
+        "extraction_failed": extraction_failed
+    }
+
+
+def run_pipeline(fetch_n: Optional[int] = 100, workers: Optional[int] = None, chunksize: Optional[int] = None,
+                 max_bytes: int = MAX_CHUNK_BYTES, triage: bool = True):
     """
     Main pipeline:
      - Ensure DB exists
-     - Fetch latest N emails
-     - For each email not already in DB:
+     - Stream the latest N emails (all if fetch_n is falsy)
+     - Triage on headers: newsletters, auto-replies, no-reply senders and
+       denylisted senders are stored in minimal form (already processed)
+       without downloading their bodies or running any model
+     - For each other email not already in DB:
          - classify type / sentiment / priority
          - extract structured info (phone, alt email, requirements) via extract_info
          - insert into DB
+    Emails are handled in chunks of at most max_bytes, so memory stays flat
+    for large backfills. Classification/extraction runs on an ExtractionPool
+    of `workers` forked processes (default EXTRACT_WORKERS); inserts stay in
+    this process, as do sender profile lookups/updates: each email is sent to
+    the workers with its sender's profile so known senders can skip NER.
     """
     print("Initializing DB...")
     db.init_db()
 
-    print(f"Fetching up to {fetch_n} emails...")
-    emails = fetch_emails(fetch_n)
-    print(f"Fetched {len(emails)} emails")
-
-    inserted = 0
-    for mail in emails:
-        # skip duplicates by message-id
-        if db.email_exists(mail["id"]):
-            continue
-
-        # classify (type, sentiment, priority)
-        classified = classify_email(mail.copy())  # returns mail updated with type/sentiment/priority
-
-        # ensure sentiment and priority exist (classify_email handles that)
-        sentiment = classified.get("sentiment", "Neutral")
-        priority = classified.get("priority", "Not Urgent")
-
-        # info extraction (phone, alternate email, requirements or summary)
-        try:
-            info = extract_info({
-                "subject": classified.get("subject"),
-                "snippet": (classified.get("body") or "")[:200],
-                "body": classified.get("body")
-            })
-            phone = info.get("phone") or None
-            alt_email = info.get("alternate_email") or info.get("email") or None
-            requirements = info.get("requirements") or info.get("summary") or None
-        except Exception as e:
-            phone = None
-            alt_email = None
-            requirements = None
-
-        # Build record for DB
-        record = {
-            "id": classified["id"],
-            "sender": classified.get("sender"),
-            "subject": classified.get("subject"),
-            "body": classified.get("body"),
-            "date": classified.get("date"),
-            "type": classified.get("type"),
-            "sentiment": sentiment,
-            "priority": priority,
-            "phone": phone,
-            "alt_email": alt_email,
-            "requirements": requirements,
-            "draft_response": None
-        }
-
-        try:
-            inserted_flag = db.insert_email(record)
-            if inserted_flag:
-                inserted += 1
-        except Exception as e:
-            print(f"Error inserting email {record.get('id')}: {e}")
+    print(f"Fetching up to {fetch_n or 'all'} emails...")
+    fetched = inserted = 0
+    policy = TriagePolicy(SENDER_ALLOWLIST, SENDER_DENYLIST) if triage else None
+    report = TriageReport()
+    profiles = SenderProfiles()
+    with Spool() as spool, ExtractionPool(workers, chunksize) as pool:
+        for chunk in chunked(iter_emails(fetch_n, spool, max_bytes, policy, report), max_bytes):
+            fetched += len(chunk)
+            # skip duplicates by message-id
+            new_mails = [mail for mail in chunk if not db.email_exists(mail.id)]
+            del chunk
+            skipped = [skipped_record(mail) for mail in new_mails if mail.triage]
+            new_mails = [mail.to_dict() for mail in new_mails if not mail.triage]
+            for mail, profile in zip(new_mails, profiles.lookup([m["sender"] for m in new_mails])):
+                mail["profile"] = profile
+            extracted = []
+            for record in chain(skipped, pool.imap(build_record, new_mails)):
+                try:
+                    inserted_flag = db.insert_email(record)
+                    if inserted_flag:
+                        inserted += 1
+                        if record.get("extracted"):
+                            extracted.append((record["id"], record["sender"], record["extracted"]))
+                except Exception as e:
+                    print(f"Error inserting email {record.get('id')}: {e}")
+            profiles.observe(extracted)
+    print(f"Fetched {fetched} emails")
+    if policy is not None:
+        print(f"Triage: {report.as_dict()}")
+    print(f"Sender profiles: {profiles.stats()}")
 
     print(f"Inserted {inserted} new email(s) into DB.")
 
+    # archive old processed partitions, purge ones past retention
+    retention = db.apply_retention()
+    if retention["archived"] or retention["purged"]:
+        print(f"Archived partitions: {retention['archived']}, purged partitions: {retention['purged']}")
+
     # Optional: print top 10 urgent unprocessed messages
     queue = db.get_next_emails(10)
     if queue:
@@ -183,5 +188,53 @@ def run_pipeline(fetch_n: int = 100):
     else:
         print("No unprocessed items in queue.")
 
+def reprocess_spooled(item) -> Dict:
+    """Pool worker for reprocess(): (msg_id, raw bytes) -> DB record."""
+    msg_id, raw = item
+    mail = parse_message(raw).to_dict()
+    mail["id"] = msg_id
+    return build_record(mail)
+
+
+def reprocess(workers: Optional[int] = None, chunksize: Optional[int] = None, batch_size: int = 500):
+    """
+    Re-run classification and extraction over every message in the local
+    spool and update the stored rows in place. No IMAP access.
+    """
+    db.init_db()
+    updated = skipped = 0
+    batch = []
+    with Spool() as spool, ExtractionPool(workers, chunksize) as pool:
+        print(f"Reprocessing {len(spool)} spooled email(s)...")
+        for record in pool.imap(reprocess_spooled, spool.iter_messages()):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                result = db.update_analysis(batch)
+                updated += result["updated"]
+                skipped += result["skipped_archived"]
+                batch = []
+        if batch:
+            result = db.update_analysis(batch)
+            updated += result["updated"]
+            skipped += result["skipped_archived"]
+    print(f"Updated {updated} email(s); skipped {skipped} in archived partitions.")
+
+
 if __name__ == "__main__":
-    run_pipeline()
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fetch", type=int, default=100, help="number of latest emails to fetch (0 = whole mailbox)")
+    parser.add_argument("--max-chunk-mb", type=float, default=MAX_CHUNK_BYTES / (1024 * 1024),
+                        help="memory ceiling for emails held at once")
+    parser.add_argument("--reprocess", action="store_true", help="re-label stored emails from the local spool")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--no-triage", action="store_true", help="download and analyse every email")
+    args = parser.parse_args()
+
+    if args.reprocess:
+        reprocess(args.workers, args.chunksize)
+    else:
+        run_pipeline(args.fetch, args.workers, args.chunksize, int(args.max_chunk_mb * 1024 * 1024),
+                     triage=not args.no_triage)
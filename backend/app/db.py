@@ -1,12 +1,86 @@
 # app/db.py
+import json
+import os
+import shutil
 import sqlite3
-from datetime import datetime
-from typing import Optional, List, Dict
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from collections import Counter, defaultdict
+from typing import Optional, List, Dict, Tuple
+from urllib.parse import quote
 
 DB_PATH = "emails.db"
 
+# Emails are stored in one SQLite file per month of their Date header (or of
+# received_at when it is missing / unparsable), next to DB_PATH under
+# partitions/. DB_PATH itself only holds the routing catalog,
+# the id -> month index and the dashboard aggregates.
+PARTITION_DIRNAME = "partitions"
+ARCHIVE_DIRNAME = "archive"
+
+# Processed partitions older than this are compacted into a read-only archive.
+ARCHIVE_AFTER_DAYS = 90
+# Partitions older than this are deleted outright.
+RETENTION_DAYS = 730
+
 SCHEMA = """
-CREATE TABLE IF NOT EXISTS emails (
+CREATE TABLE IF NOT EXISTS partitions (
+    month TEXT PRIMARY KEY,         -- 'YYYY_MM' of the message date
+    path TEXT NOT NULL,
+    archived INTEGER DEFAULT 0,     -- 1 = compacted read-only copy under the archive dir
+    row_count INTEGER DEFAULT 0,
+    unprocessed INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS email_index (
+    id TEXT PRIMARY KEY,            -- Message-ID
+    month TEXT NOT NULL             -- partition holding the row
+);
+CREATE INDEX IF NOT EXISTS idx_email_index_month ON email_index (month);
+
+-- Ids of mail dropped by retention (purged, or already past it on insert),
+-- so it isn't downloaded and analysed again while still in the mailbox.
+CREATE TABLE IF NOT EXISTS purged_ids (
+    id TEXT PRIMARY KEY             -- Message-ID
+);
+
+-- Dashboard aggregates, kept current by the writers below so reads never
+-- have to GROUP BY over the emails tables.
+CREATE TABLE IF NOT EXISTS email_stats (
+    dimension TEXT NOT NULL,        -- total / type / sentiment / priority / processed / day
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, value)
+);
+
+-- Bumped on every write to emails; used as the ETag for read endpoints.
+CREATE TABLE IF NOT EXISTS stats_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO stats_meta (id, version) VALUES (0, 0);
+
+-- Latest contact details seen per sender, folded in after every extraction
+-- so repeat senders can skip the NER pass.
+CREATE TABLE IF NOT EXISTS sender_profiles (
+    sender TEXT PRIMARY KEY,        -- normalized From address
+    name TEXT,
+    phone TEXT,
+    alt_email TEXT,
+    order_ids TEXT,                 -- JSON list, most recent last
+    message_count INTEGER NOT NULL DEFAULT 0,
+    first_seen TEXT,
+    last_seen TEXT
+);
+
+-- Messages already folded into a profile, so re-fetched mail counts once.
+CREATE TABLE IF NOT EXISTS profile_messages (
+    id TEXT PRIMARY KEY             -- Message-ID
+);
+"""
+
+PARTITION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {schema}.emails (
     id TEXT PRIMARY KEY,            -- Message-ID or generated unique id
     sender TEXT,
     subject TEXT,
@@ -23,37 +97,266 @@ CREATE TABLE IF NOT EXISTS emails (
     processed INTEGER DEFAULT 0     -- 0 = not processed, 1 = processed
 );
 
-CREATE INDEX IF NOT EXISTS idx_priority_date ON emails (priority, date);
-CREATE INDEX IF NOT EXISTS idx_processed ON emails (processed);
+CREATE INDEX IF NOT EXISTS {schema}.idx_priority_date ON emails (priority, date);
+CREATE INDEX IF NOT EXISTS {schema}.idx_processed ON emails (processed);
+CREATE INDEX IF NOT EXISTS {schema}.idx_received ON emails (received_at, id);
 """
 
+EMAIL_COLUMNS = ["id","sender","subject","body","date","received_at","type","sentiment","priority","phone","alt_email","requirements","draft_response","processed"]
+
+STATS_DIMENSIONS = ["type", "sentiment", "priority", "processed", "day"]
+
+PROFILE_COLUMNS = ["sender", "name", "phone", "alt_email", "order_ids", "message_count", "first_seen", "last_seen"]
+# Order ids kept per sender profile.
+PROFILE_MAX_ORDER_IDS = 20
+
+# Model-derived columns that can be recomputed from the raw message.
+ANALYSIS_COLUMNS = ["type", "sentiment", "priority", "phone", "alt_email", "requirements"]
+# The subset filled by extract_info (left alone when a record's extraction failed).
+EXTRACTION_COLUMNS = ["phone", "alt_email", "requirements"]
+
 def get_conn():
-    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES, uri=True)
     return conn
 
+# --------- Partition routing ---------
+
+def partition_key(received_at: str) -> str:
+    """'2025-03-14T09:00:00' -> '2025_03'"""
+    return received_at[:7].replace("-", "_")
+
+def _partition_dir(archived: bool = False) -> str:
+    base = os.path.join(os.path.dirname(DB_PATH), PARTITION_DIRNAME)
+    return os.path.join(base, ARCHIVE_DIRNAME) if archived else base
+
+def mail_month(date: Optional[str], received_at: str) -> str:
+    """
+    Partition month of a message: its Date header in UTC, falling back to
+    received_at when the header is missing or unparsable. Dates in the
+    future are clamped to received_at.
+    """
+    try:
+        sent = parsedate_to_datetime(date)
+    except (TypeError, ValueError, IndexError):
+        sent = None
+    if sent is None:
+        return partition_key(received_at)
+    if sent.tzinfo is not None:
+        sent = sent.astimezone(timezone.utc).replace(tzinfo=None)
+    return partition_key(min(sent.isoformat(), received_at))
+
+def _months_ago(days: int) -> str:
+    return partition_key((datetime.utcnow() - timedelta(days=days)).isoformat())
+
+def _attach(cur, part: Tuple, alias: str = "p"):
+    """ATTACH a (month, path, archived) partition; archived ones read-only."""
+    _, path, archived = part[:3]
+    uri = "file:" + quote(os.path.abspath(path)) + ("?mode=ro" if archived else "")
+    cur.execute(f"ATTACH DATABASE ? AS {alias}", (uri,))
+
+def _detach(conn, alias: str = "p"):
+    conn.commit()  # DETACH is not allowed inside a transaction
+    conn.execute(f"DETACH DATABASE {alias}")
+
+def _get_partition(cur, month: str) -> Optional[Tuple]:
+    cur.execute("SELECT month, path, archived FROM partitions WHERE month = ?", (month,))
+    return cur.fetchone()
+
+def _ensure_partition(conn, month: str) -> Tuple:
+    cur = conn.cursor()
+    part = _get_partition(cur, month)
+    if part:
+        return part
+    path = os.path.join(_partition_dir(), f"emails_{month}.db")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    part = (month, path, 0)
+    conn.commit()
+    _attach(cur, part)
+    cur.executescript(PARTITION_SCHEMA.format(schema="p"))
+    _detach(conn)
+    cur.execute("INSERT OR IGNORE INTO partitions (month, path) VALUES (?, ?)", (month, path))
+    conn.commit()
+    return _get_partition(cur, month)
+
+def _reopen_partition(conn, part: Tuple) -> Tuple:
+    """Move an archived partition back to the hot dir (e.g. to import old mail into it)."""
+    month, archive_path, _ = part
+    path = os.path.join(_partition_dir(), os.path.basename(archive_path))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    shutil.copyfile(archive_path, path)
+    os.chmod(path, 0o644)
+    cur = conn.cursor()
+    cur.execute("UPDATE partitions SET path = ?, archived = 0 WHERE month = ?", (path, month))
+    conn.commit()
+    os.chmod(archive_path, 0o644)
+    os.remove(archive_path)
+    return _get_partition(cur, month)
+
+def _locate(cur, msg_id: str) -> Optional[Tuple]:
+    cur.execute(
+        """
+        SELECT p.month, p.path, p.archived
+        FROM email_index i JOIN partitions p ON p.month = i.month
+        WHERE i.id = ?
+        """,
+        (msg_id,),
+    )
+    return cur.fetchone()
+
+def _group_by_partition(cur, msg_ids: List[str]) -> Dict[str, List[str]]:
+    """Map stored ids to their partition month; unknown ids are dropped."""
+    by_month = defaultdict(list)
+    for i in range(0, len(msg_ids), 500):
+        chunk = msg_ids[i:i + 500]
+        cur.execute(
+            f"SELECT id, month FROM email_index WHERE id IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        )
+        for msg_id, month in cur.fetchall():
+            by_month[month].append(msg_id)
+    return by_month
+
+def list_partitions() -> List[Dict]:
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT month, path, archived, row_count, unprocessed FROM partitions ORDER BY month DESC")
+    rows = cur.fetchall()
+    conn.close()
+    return [dict(zip(["month", "path", "archived", "row_count", "unprocessed"], r)) for r in rows]
+
+# --------- Aggregates ---------
+
+def _stat_value(dim: str, record: Dict) -> str:
+    if dim == "day":
+        return (record.get("received_at") or "")[:10]
+    if dim == "processed":
+        return str(int(record.get("processed") or 0))
+    return record.get(dim) or ""
+
+def _bump_version(cur):
+    cur.execute("UPDATE stats_meta SET version = version + 1 WHERE id = 0")
+
+def _add_stats(cur, counts: List[Tuple[str, str, int]]):
+    cur.executemany(
+        """
+        INSERT INTO email_stats (dimension, value, count) VALUES (?, ?, ?)
+        ON CONFLICT (dimension, value) DO UPDATE SET count = count + excluded.count
+        """,
+        counts,
+    )
+    _bump_version(cur)
+
+def _partition_stats(cur, alias: str = "p") -> List[Tuple[str, str, int]]:
+    """Full GROUP BY over one attached partition (maintenance paths only)."""
+    counts = []
+    cur.execute(f"SELECT COUNT(*) FROM {alias}.emails")
+    counts.append(("total", "", cur.fetchone()[0]))
+    for dim in STATS_DIMENSIONS:
+        expr = "substr(received_at, 1, 10)" if dim == "day" else dim
+        cur.execute(f"SELECT COALESCE({expr}, ''), COUNT(*) FROM {alias}.emails GROUP BY 1")
+        counts.extend((dim, str(value), n) for value, n in cur.fetchall())
+    return counts
+
+def _rebuild_stats(conn):
+    """Recompute email_stats from every partition (only needed on migration)."""
+    cur = conn.cursor()
+    cur.execute("SELECT month, path, archived FROM partitions")
+    counts = []
+    for part in cur.fetchall():
+        _attach(cur, part)
+        counts.extend(_partition_stats(cur))
+        _detach(conn)
+    cur.execute("DELETE FROM email_stats")
+    _add_stats(cur, counts)
+    conn.commit()
+
+def _migrate_legacy(conn):
+    """Move rows of a pre-partitioning single `emails` table into month partitions."""
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails'")
+    if cur.fetchone() is None:
+        return False
+    cur.execute("UPDATE emails SET received_at = ? WHERE received_at IS NULL", (datetime.utcnow().isoformat(),))
+    conn.commit()
+    # Date headers can't be parsed in SQL; map id -> month here first
+    cur.execute("CREATE TEMP TABLE legacy_month (id TEXT PRIMARY KEY, month TEXT NOT NULL)")
+    cur.execute("SELECT id, date, received_at FROM emails")
+    cur.executemany(
+        "INSERT OR IGNORE INTO legacy_month (id, month) VALUES (?, ?)",
+        [(msg_id, mail_month(date, received_at)) for msg_id, date, received_at in cur.fetchall()],
+    )
+    conn.commit()
+    cur.execute("SELECT DISTINCT month FROM legacy_month")
+    for (month,) in cur.fetchall():
+        part = _ensure_partition(conn, month)
+        _attach(cur, part)
+        cur.execute(
+            f"INSERT OR IGNORE INTO p.emails SELECT {', '.join('e.' + c for c in EMAIL_COLUMNS)} "
+            "FROM main.emails e JOIN legacy_month m ON m.id = e.id WHERE m.month = ?",
+            (month,),
+        )
+        cur.execute("INSERT OR IGNORE INTO email_index (id, month) SELECT id, month FROM legacy_month WHERE month = ?", (month,))
+        cur.execute(
+            "UPDATE partitions SET row_count = (SELECT COUNT(*) FROM p.emails), "
+            "unprocessed = (SELECT COUNT(*) FROM p.emails WHERE processed = 0) WHERE month = ?",
+            (month,),
+        )
+        _detach(conn)
+    cur.execute("DROP TABLE legacy_month")
+    cur.execute("DROP TABLE emails")  # also drops its old stats triggers
+    conn.commit()
+    return True
+
 def init_db():
     conn = get_conn()
     cur = conn.cursor()
     cur.executescript(SCHEMA)
     conn.commit()
+    migrated = _migrate_legacy(conn)
+    # databases created before email_stats existed: seed it once
+    cur.execute("SELECT 1 FROM email_stats LIMIT 1")
+    if migrated or cur.fetchone() is None:
+        _rebuild_stats(conn)
     conn.close()
 
+# --------- Writes ---------
+
 def email_exists(msg_id: str) -> bool:
     if not msg_id:
         return False
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute("SELECT 1 FROM emails WHERE id = ?", (msg_id,))
+    cur.execute("SELECT 1 FROM email_index WHERE id = ? UNION ALL SELECT 1 FROM purged_ids WHERE id = ?",
+                (msg_id, msg_id))
     exists = cur.fetchone() is not None
     conn.close()
     return exists
 
+def stored_ids(msg_ids: List[str]) -> set:
+    """The subset of msg_ids already stored (any partition) or dropped by retention."""
+    conn = get_conn()
+    cur = conn.cursor()
+    found = set()
+    for i in range(0, len(msg_ids), 500):
+        chunk = msg_ids[i:i + 500]
+        marks = ", ".join("?" * len(chunk))
+        cur.execute(f"SELECT id FROM email_index WHERE id IN ({marks}) "
+                    f"UNION SELECT id FROM purged_ids WHERE id IN ({marks})", chunk + chunk)
+        found.update(r[0] for r in cur.fetchall())
+    conn.close()
+    return found
+
 def insert_email(record: Dict):
     """
     Insert a classified email record into DB if not exists.
     record expected fields:
       id, sender, subject, body, date, type, sentiment, priority,
-      phone, alt_email, requirements, draft_response (optional)
+      phone, alt_email, requirements, draft_response (optional),
+      processed (optional, default 0)
+    The row goes to the partition of its message date (see mail_month());
+    an archived partition is moved back to the hot dir to take it. Mail
+    already past RETENTION_DAYS is not stored, only its id is remembered
+    in purged_ids (returns False).
     """
     if "id" not in record or not record["id"]:
         raise ValueError("record must include unique 'id' field")
@@ -61,12 +364,26 @@ def insert_email(record: Dict):
     if email_exists(record["id"]):
         return False
 
+    received_at = datetime.utcnow().isoformat()
+    month = mail_month(record.get("date"), received_at)
+    # triage-skipped records arrive already processed; everything else is queued
+    processed = 1 if record.get("processed") else 0
     conn = get_conn()
     cur = conn.cursor()
+    if month < _months_ago(RETENTION_DAYS):
+        # would be purged right away; remember the id instead of storing it
+        cur.execute("INSERT OR IGNORE INTO purged_ids (id) VALUES (?)", (record["id"],))
+        conn.commit()
+        conn.close()
+        return False
+    part = _ensure_partition(conn, month)
+    if part[2]:
+        part = _reopen_partition(conn, part)
+    _attach(cur, part)
     cur.execute(
         """
-        INSERT INTO emails (id, sender, subject, body, date, received_at, type, sentiment, priority,
-                            phone, alt_email, requirements, draft_response, processed)
+        INSERT INTO p.emails (id, sender, subject, body, date, received_at, type, sentiment, priority,
+                              phone, alt_email, requirements, draft_response, processed)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (
@@ -75,7 +392,7 @@ def insert_email(record: Dict):
             record.get("subject"),
             record.get("body"),
             record.get("date"),
-            datetime.utcnow().isoformat(),
+            received_at,
             record.get("type"),
             record.get("sentiment"),
             record.get("priority"),
@@ -83,50 +400,401 @@ def insert_email(record: Dict):
             record.get("alt_email"),
             record.get("requirements"),
             record.get("draft_response"),
-            0
+            processed
         ),
     )
-    conn.commit()
+    cur.execute("INSERT INTO email_index (id, month) VALUES (?, ?)", (record["id"], month))
+    cur.execute("UPDATE partitions SET row_count = row_count + 1, unprocessed = unprocessed + ? WHERE month = ?",
+                (1 - processed, month))
+    stats_row = {**record, "received_at": received_at, "processed": processed}
+    _add_stats(cur, [("total", "", 1)] + [(dim, _stat_value(dim, stats_row), 1) for dim in STATS_DIMENSIONS])
+    _detach(conn)
     conn.close()
     return True
 
+def mark_processed(msg_id: str):
+    mark_processed_many([msg_id])
+
+def mark_processed_many(msg_ids: List[str]) -> int:
+    """
+    Set processed = 1 for many emails, one transaction per partition.
+    Archived partitions only hold processed rows and are skipped.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+    marked = 0
+    for month, ids in _group_by_partition(cur, msg_ids).items():
+        part = _get_partition(cur, month)
+        if part[2]:
+            continue
+        _attach(cur, part)
+        n = 0
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            cur.execute(
+                f"UPDATE p.emails SET processed = 1 WHERE processed = 0 AND id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            n += cur.rowcount
+        if n:
+            cur.execute("UPDATE partitions SET unprocessed = unprocessed - ? WHERE month = ?", (n, month))
+            _add_stats(cur, [("processed", "0", -n), ("processed", "1", n)])
+        _detach(conn)
+        marked += n
+    conn.close()
+    return marked
+
+def update_draft_response(msg_id: str, draft: str) -> bool:
+    """False if the email is not stored or sits in an archived (read-only) partition."""
+    conn = get_conn()
+    cur = conn.cursor()
+    part = _locate(cur, msg_id)
+    if not part or part[2]:
+        conn.close()
+        return False
+    _attach(cur, part)
+    cur.execute("UPDATE p.emails SET draft_response = ? WHERE id = ?", (draft, msg_id))
+    _bump_version(cur)
+    _detach(conn)
+    conn.close()
+    return True
+
+def update_analysis(records: List[Dict]) -> Dict[str, int]:
+    """
+    Overwrite ANALYSIS_COLUMNS of already stored emails in place (e.g. after a
+    classifier change), one transaction per partition. Ids that are not
+    stored are ignored; rows in archived (read-only) partitions are skipped.
+    Records with a true "extraction_failed" keep their stored
+    EXTRACTION_COLUMNS. Returns {"updated": n, "skipped_archived": n}.
+    """
+    by_id = {r["id"]: r for r in records if r.get("id")}
+    conn = get_conn()
+    cur = conn.cursor()
+    by_month = {
+        month: [by_id[msg_id] for msg_id in ids]
+        for month, ids in _group_by_partition(cur, list(by_id)).items()
+    }
+
+    result = {"updated": 0, "skipped_archived": 0}
+    for month, recs in by_month.items():
+        part = _get_partition(cur, month)
+        if part[2]:
+            result["skipped_archived"] += len(recs)
+            continue
+        _attach(cur, part)
+        old = {}
+        for i in range(0, len(recs), 500):
+            chunk = [r["id"] for r in recs[i:i + 500]]
+            cur.execute(
+                f"SELECT id, type, sentiment, priority FROM p.emails WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            old.update((r[0], dict(zip(["type", "sentiment", "priority"], r[1:]))) for r in cur.fetchall())
+        for failed in (False, True):
+            cols = [c for c in ANALYSIS_COLUMNS if not (failed and c in EXTRACTION_COLUMNS)]
+            cur.executemany(
+                f"UPDATE p.emails SET {', '.join(c + ' = ?' for c in cols)} WHERE id = ?",
+                [[r.get(c) for c in cols] + [r["id"]] for r in recs if bool(r.get("extraction_failed")) == failed],
+            )
+        delta = Counter()
+        for r in recs:
+            for dim in ("type", "sentiment", "priority"):
+                before, after = _stat_value(dim, old.get(r["id"], {})), _stat_value(dim, r)
+                if before != after:
+                    delta[(dim, before)] -= 1
+                    delta[(dim, after)] += 1
+        _add_stats(cur, [(dim, value, n) for (dim, value), n in delta.items() if n])
+        _detach(conn)
+        result["updated"] += len(recs)
+    conn.close()
+    return result
+
+# --------- Reads ---------
+
 def get_next_emails(limit: int = 20) -> List[Dict]:
     """
     Returns next emails ordered by priority (Urgent first) then newest date.
     Priority ordering: 'Urgent' first, everything else after.
+    Only partitions that still have unprocessed rows are read.
     """
     conn = get_conn()
     cur = conn.cursor()
-    # Use CASE to order Urgent first, then Not Urgent
-    cur.execute(
-        f"""
-        SELECT id, sender, subject, body, date, received_at, type, sentiment, priority,
-               phone, alt_email, requirements, draft_response, processed
-        FROM emails
-        WHERE processed = 0
-        ORDER BY (CASE WHEN priority = 'Urgent' THEN 0 ELSE 1 END) ASC,
-                 COALESCE(date, received_at) DESC
-        LIMIT ?
-        """,
-        (limit,),
-    )
-    rows = cur.fetchall()
+    cur.execute("SELECT month, path, archived FROM partitions WHERE unprocessed > 0 ORDER BY month DESC")
+    parts = cur.fetchall()
+
+    rows = []
+    for part in parts:
+        _attach(cur, part)
+        # Use CASE to order Urgent first, then Not Urgent
+        cur.execute(
+            f"""
+            SELECT {", ".join(EMAIL_COLUMNS)}
+            FROM p.emails
+            WHERE processed = 0
+            ORDER BY (CASE WHEN priority = 'Urgent' THEN 0 ELSE 1 END) ASC,
+                     COALESCE(date, received_at) DESC
+            LIMIT ?
+            """,
+            (limit,),
+        )
+        rows.extend(cur.fetchall())
+        _detach(conn)
     conn.close()
 
-    cols = ["id","sender","subject","body","date","received_at","type","sentiment","priority","phone","alt_email","requirements","draft_response","processed"]
-    results = [dict(zip(cols, r)) for r in rows]
+    results = [dict(zip(EMAIL_COLUMNS, r)) for r in rows]
+    # merge the per-partition top-N lists with the same ordering as the SQL
+    results.sort(key=lambda r: r["date"] or r["received_at"] or "", reverse=True)
+    results.sort(key=lambda r: 0 if r["priority"] == "Urgent" else 1)
+    return results[:limit]
+
+def get_drafted_emails(limit: int = 500) -> List[Dict]:
+    """Unprocessed emails that already have a draft_response, oldest first."""
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT month, path, archived FROM partitions WHERE unprocessed > 0 ORDER BY month")
+    parts = cur.fetchall()
+
+    results = []
+    for part in parts:
+        _attach(cur, part)
+        cur.execute(
+            f"""
+            SELECT {", ".join(EMAIL_COLUMNS)}
+            FROM p.emails
+            WHERE processed = 0 AND draft_response IS NOT NULL AND draft_response != ''
+            ORDER BY received_at, id
+            LIMIT ?
+            """,
+            (limit - len(results),),
+        )
+        results.extend(dict(zip(EMAIL_COLUMNS, r)) for r in cur.fetchall())
+        _detach(conn)
+        if len(results) >= limit:
+            break
+    conn.close()
     return results
 
-def mark_processed(msg_id: str):
+def get_stats_version() -> int:
+    """Monotonic counter bumped by every write to emails."""
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute("UPDATE emails SET processed = 1 WHERE id = ?", (msg_id,))
-    conn.commit()
+    cur.execute("SELECT version FROM stats_meta WHERE id = 0")
+    row = cur.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+def get_stats() -> Dict:
+    """
+    Dashboard counts by type / sentiment / priority / processed / day, read
+    straight from the incrementally maintained email_stats table.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT version FROM stats_meta WHERE id = 0")
+    version = cur.fetchone()[0]
+    cur.execute("SELECT dimension, value, count FROM email_stats WHERE count > 0")
+    rows = cur.fetchall()
+    conn.close()
+
+    stats = {"version": version, "total": 0}
+    stats.update({dim: {} for dim in STATS_DIMENSIONS})
+    for dim, value, count in rows:
+        if dim == "total":
+            stats["total"] = count
+        else:
+            stats[dim][value] = count
+    return stats
+
+def list_emails(limit: int = 50, fields: Optional[List[str]] = None, before: Optional[str] = None,
+                filters: Optional[Dict] = None) -> List[Dict]:
+    """
+    Newest-first page of emails for the dashboard.
+    fields: columns to return (id and received_at are always included); body
+            is left out unless asked for.
+    before: keyset cursor "<received_at>|<id>" taken from the last row of the
+            previous page.
+    filters: equality filters on type / sentiment / priority / processed.
+    Each partition contributes at most `limit` rows; they are merged here.
+    """
+    if fields:
+        unknown = set(fields) - set(EMAIL_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown field(s): {', '.join(sorted(unknown))}")
+        cols = ["id", "received_at"] + [f for f in fields if f not in ("id", "received_at")]
+    else:
+        cols = [c for c in EMAIL_COLUMNS if c != "body"]
+
+    where, params = [], []
+    for key, value in (filters or {}).items():
+        if value is None:
+            continue
+        if key not in ("type", "sentiment", "priority", "processed"):
+            raise ValueError(f"cannot filter on {key!r}")
+        where.append(f"{key} = ?")
+        params.append(value)
+    if before:
+        received_at, _, msg_id = before.partition("|")
+        where.append("(received_at, id) < (?, ?)")
+        params.extend([received_at, msg_id])
+
+    conn = get_conn()
+    cur = conn.cursor()
+    # Partitions follow the message date, not received_at (backfilled mail
+    # is old-dated but newly received), so any partition can hold the next
+    # rows: take the top `limit` of each and merge.
+    cur.execute("SELECT month, path, archived FROM partitions WHERE row_count > 0")
+    parts = cur.fetchall()
+
+    results = []
+    for part in parts:
+        _attach(cur, part)
+        cur.execute(
+            f"""
+            SELECT {", ".join(cols)}
+            FROM p.emails
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY received_at DESC, id DESC
+            LIMIT ?
+            """,
+            (*params, limit),
+        )
+        results.extend(dict(zip(cols, r)) for r in cur.fetchall())
+        _detach(conn)
+    conn.close()
+    results.sort(key=lambda r: (r["received_at"], r["id"]), reverse=True)
+    return results[:limit]
+
+# --------- Sender profiles ---------
+
+def _profile_row(row: Tuple) -> Dict:
+    profile = dict(zip(PROFILE_COLUMNS, row))
+    profile["order_ids"] = json.loads(profile["order_ids"] or "[]")
+    return profile
+
+def get_sender_profiles(senders: List[str]) -> Dict[str, Dict]:
+    """Stored profiles for the given normalized sender addresses (absent ones are left out)."""
+    conn = get_conn()
+    cur = conn.cursor()
+    profiles = {}
+    senders = list(senders)
+    for i in range(0, len(senders), 500):
+        chunk = senders[i:i + 500]
+        cur.execute(
+            f"SELECT {', '.join(PROFILE_COLUMNS)} FROM sender_profiles WHERE sender IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        )
+        profiles.update((r[0], _profile_row(r)) for r in cur.fetchall())
     conn.close()
+    return profiles
 
-def update_draft_response(msg_id: str, draft: str):
+def update_sender_profiles(updates: List[Dict]) -> Dict[str, Dict]:
+    """
+    Fold extraction results into sender profiles, in one transaction.
+    Each update has `sender` (normalized), `message_id` and any of name,
+    phone, alt_email, order_id; non-empty values replace the stored ones,
+    the order id is appended and message_count goes up by one. Messages
+    already folded in before are ignored. Returns the changed profiles.
+    """
+    now = datetime.utcnow().isoformat()
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute("UPDATE emails SET draft_response = ? WHERE id = ?", (draft, msg_id))
+    profiles = {}
+    for update in updates:
+        sender = update.get("sender")
+        if not sender:
+            continue
+        if update.get("message_id"):
+            cur.execute("INSERT OR IGNORE INTO profile_messages (id) VALUES (?)", (update["message_id"],))
+            if not cur.rowcount:
+                continue
+        profile = profiles.get(sender)
+        if profile is None:
+            cur.execute(f"SELECT {', '.join(PROFILE_COLUMNS)} FROM sender_profiles WHERE sender = ?", (sender,))
+            row = cur.fetchone()
+            profile = _profile_row(row) if row else {
+                "sender": sender, "name": None, "phone": None, "alt_email": None,
+                "order_ids": [], "message_count": 0, "first_seen": now, "last_seen": now,
+            }
+        for field in ("name", "phone", "alt_email"):
+            if update.get(field):
+                profile[field] = update[field]
+        order_id = update.get("order_id")
+        if order_id:
+            order_ids = [o for o in profile["order_ids"] if o != order_id] + [order_id]
+            profile["order_ids"] = order_ids[-PROFILE_MAX_ORDER_IDS:]
+        profile["message_count"] += 1
+        profile["last_seen"] = now
+        profiles[sender] = profile
+    cur.executemany(
+        f"INSERT OR REPLACE INTO sender_profiles ({', '.join(PROFILE_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(PROFILE_COLUMNS))})",
+        [[json.dumps(p[c]) if c == "order_ids" else p[c] for c in PROFILE_COLUMNS] for p in profiles.values()],
+    )
     conn.commit()
     conn.close()
+    return profiles
+
+# --------- Retention ---------
+
+def archive_partitions(older_than_days: int = ARCHIVE_AFTER_DAYS) -> List[str]:
+    """
+    Compact (VACUUM INTO) fully processed partitions whose whole month is older
+    than `older_than_days` into the archive dir, make them read-only and drop
+    the originals. Returns the archived months.
+    """
+    cutoff = _months_ago(older_than_days)
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT month, path FROM partitions WHERE archived = 0 AND unprocessed = 0 AND month < ? ORDER BY month",
+        (cutoff,),
+    )
+    archived = []
+    for month, path in cur.fetchall():
+        archive_path = os.path.join(_partition_dir(archived=True), os.path.basename(path))
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        if os.path.exists(archive_path):
+            os.chmod(archive_path, 0o644)
+            os.remove(archive_path)
+        src = sqlite3.connect(path)
+        src.execute("VACUUM INTO ?", (archive_path,))
+        src.close()
+        os.chmod(archive_path, 0o444)
+        cur.execute("UPDATE partitions SET path = ?, archived = 1 WHERE month = ?", (archive_path, month))
+        conn.commit()
+        os.remove(path)
+        archived.append(month)
+    conn.close()
+    return archived
+
+def purge_partitions(retention_days: int = RETENTION_DAYS) -> List[str]:
+    """
+    Delete partitions (hot or archived) whose whole month is older than
+    `retention_days`. Their ids move to purged_ids.
+    """
+    cutoff = _months_ago(retention_days)
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT month, path, archived FROM partitions WHERE month < ? ORDER BY month", (cutoff,))
+    purged = []
+    for part in cur.fetchall():
+        month, path, _ = part
+        _attach(cur, part)
+        counts = _partition_stats(cur)
+        _detach(conn)
+        _add_stats(cur, [(dim, value, -n) for dim, value, n in counts])
+        cur.execute("INSERT OR IGNORE INTO purged_ids (id) SELECT id FROM email_index WHERE month = ?", (month,))
+        cur.execute("DELETE FROM email_index WHERE month = ?", (month,))
+        cur.execute("DELETE FROM partitions WHERE month = ?", (month,))
+        conn.commit()
+        if os.path.exists(path):
+            os.remove(path)
+        purged.append(month)
+    conn.close()
+    return purged
+
+def apply_retention(archive_after_days: int = ARCHIVE_AFTER_DAYS, retention_days: int = RETENTION_DAYS) -> Dict:
+    return {
+        "purged": purge_partitions(retention_days),
+        "archived": archive_partitions(archive_after_days),
+    }
@@ -0,0 +1,193 @@
+import email
+import email.policy
+import hashlib
+import imaplib
+import json
+import os
+import socket
+import time
+from email.message import EmailMessage
+from email.utils import formatdate
+from typing import Dict, List, Set
+
+from app import db
+
+DRAFTS_FOLDER = "[Gmail]/Drafts"
+BATCH_SIZE = 50
+
+
+def draft_message_id(original_id: str, from_addr: str) -> str:
+    """Deterministic Message-ID for the reply to `original_id`; the idempotency key."""
+    digest = hashlib.sha1(original_id.encode("utf-8")).hexdigest()[:24]
+    domain = from_addr.rpartition("@")[2].strip("> ") or "localhost"
+    return f"<draft-{digest}@{domain}>"
+
+
+def build_reply(row: Dict, from_addr: str, references: str = "") -> EmailMessage:
+    """
+    Reply MIME message for a stored email row with its draft_response as body.
+    `references` is the original message's References header, if known.
+    """
+    subject = row.get("subject") or ""
+    msg = EmailMessage()
+    msg["From"] = from_addr
+    msg["To"] = row.get("sender") or ""
+    msg["Subject"] = subject if subject.lower().startswith("re:") else f"Re: {subject}"
+    msg["Date"] = formatdate(localtime=True)
+    msg["Message-ID"] = draft_message_id(row["id"], from_addr)
+    msg["In-Reply-To"] = row["id"]
+    msg["References"] = f"{references} {row['id']}".strip()
+    msg.set_content(row.get("draft_response") or "")
+    return msg
+
+
+def _thread_references(spool, msg_id: str) -> str:
+    """
+    The original's References (or, without them, its In-Reply-To) from the
+    spool, unfolded: folded header values contain CRLFs, which
+    EmailMessage refuses.
+    """
+    if spool is None:
+        return ""
+    raw = spool.get(msg_id)
+    if not raw:
+        return ""
+    original = email.message_from_bytes(raw)
+    references = original.get("References") or original.get("In-Reply-To") or ""
+    return " ".join(str(references).split())
+
+
+def existing_draft_ids(imap, message_count: int) -> Set[str]:
+    """Message-IDs already in the selected folder (one FETCH for all of them)."""
+    if not message_count:
+        return set()
+    status, data = imap.fetch("1:*", "(BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])")
+    if status != "OK":
+        return set()
+    ids = set()
+    for part in data:
+        if isinstance(part, tuple):
+            msg_id = email.message_from_bytes(part[1]).get("Message-ID")
+            if msg_id:
+                ids.add(msg_id.strip())
+    return ids
+
+
+class _Appender:
+    """
+    The one place that drives imaplib internals (_command, _new_tag,
+    _command_complete): imaplib has no API for sending a command without
+    waiting for its completion.
+
+    If the server advertises LITERAL+ (RFC 7888), each message goes out as a
+    non-synchronizing literal ({n+}) in the same write as its command, so a
+    batch is sent back to back. Otherwise every APPEND still waits for the
+    server's "+" continuation before its literal (one round trip per
+    message); only the wait for the tagged completion is deferred.
+    """
+
+    def __init__(self, imap):
+        self.imap = imap
+        self.literal_plus = "LITERAL+" in getattr(imap, "capabilities", ())
+
+    def send(self, folder: str, raw: bytes, date_time: str) -> bytes:
+        imap = self.imap
+        raw = imaplib.MapCRLF.sub(imaplib.CRLF, raw)
+        if not self.literal_plus:
+            imap.literal = raw
+            return imap._command("APPEND", folder, "(\\Draft)", date_time)
+        tag = imap._new_tag()  # registers the tag for _command_complete
+        command = f"{folder} (\\Draft) {date_time} {{{len(raw)}+}}".encode(imap._encoding)
+        try:
+            imap.send(tag + b" APPEND " + command + imaplib.CRLF + raw + imaplib.CRLF)
+        except OSError as e:
+            raise imap.abort(f"socket error: {e}")
+        return tag
+
+    def result(self, tag: bytes) -> bool:
+        try:
+            status, _ = self.imap._command_complete("APPEND", tag)
+        except self.imap.error:
+            return False
+        return status == "OK"
+
+
+def append_pipelined(imap, folder: str, messages: List[bytes]) -> List[bool]:
+    """APPEND all messages, then collect their tagged completions (see _Appender)."""
+    appender = _Appender(imap)
+    date_time = imaplib.Time2Internaldate(time.time())
+    tags = [appender.send(folder, raw, date_time) for raw in messages]
+    return [appender.result(tag) for tag in tags]
+
+
+def publish_drafts(imap, from_addr: str, folder: str = DRAFTS_FOLDER, batch_size: int = BATCH_SIZE,
+                   limit: int = 5000, spool=None) -> Dict[str, int]:
+    """
+    Upload drafted, unprocessed emails as replies into the Drafts folder over
+    one logged-in IMAP session and mark them processed, batch by batch.
+
+    Drafts whose Message-ID is already in the folder are not appended again
+    (only marked processed), so re-running after a crash cannot duplicate.
+    If a Spool is given, the original References header is carried over.
+    """
+    rows = db.get_drafted_emails(limit)
+    report = {"candidates": len(rows), "appended": 0, "already_present": 0, "failed": 0}
+    if not rows:
+        return report
+
+    # imaplib writes a literal and its closing CRLF separately; with Nagle on,
+    # the CRLF waits for the server's delayed ACK (~40 ms per APPEND)
+    sock = getattr(imap, "sock", None)
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    status, data = imap.select(folder)
+    if status != "OK":
+        raise RuntimeError(f"cannot select {folder}: {data}")
+    existing = existing_draft_ids(imap, int(data[0] or 0))
+
+    for i in range(0, len(rows), batch_size):
+        done, pending = [], []
+        for row in rows[i:i + batch_size]:
+            try:
+                msg = build_reply(row, from_addr, _thread_references(spool, row["id"]))
+            except Exception as e:
+                # one malformed row must not end the run after earlier batches went out
+                print(f"Cannot build draft for {row['id']}: {e}")
+                report["failed"] += 1
+                continue
+            if msg["Message-ID"] in existing:
+                done.append(row["id"])
+                report["already_present"] += 1
+            else:
+                pending.append((row["id"], msg))
+
+        results = append_pipelined(imap, folder, [m.as_bytes(policy=email.policy.SMTP) for _, m in pending])
+        for (row_id, msg), ok in zip(pending, results):
+            if ok:
+                done.append(row_id)
+                existing.add(msg["Message-ID"])
+                report["appended"] += 1
+            else:
+                report["failed"] += 1
+
+        db.mark_processed_many(done)
+    return report
+
+
+if __name__ == "__main__":
+    from app.spool import Spool
+
+    creds_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "credentials.json")
+    with open(creds_path, "r", encoding="utf-8") as f:
+        creds = json.load(f)
+
+    db.init_db()
+    imap = imaplib.IMAP4_SSL(creds.get("imap_host", "imap.gmail.com"), creds.get("imap_port", 993))
+    imap.login(creds["email_user"], creds["email_pass"])
+    try:
+        with Spool() as spool:
+            report = publish_drafts(imap, creds["email_user"], creds.get("drafts_folder", DRAFTS_FOLDER), spool=spool)
+    finally:
+        imap.logout()
+    print(f"Drafts: {report}")
@@ -1,8 +1,15 @@
+SUPPORT_KEYWORDS = ["Support", "Query", "Request", "Help"]
+
+
+def is_support_subject(subject):
+    """True if the subject contains one of the support keywords."""
+    return any(k.lower() in (subject or "").lower() for k in SUPPORT_KEYWORDS)
+
+
 def filter_support_emails(emails):
     """Filter emails with support-related keywords in subject."""
-    keywords = ["Support", "Query", "Request", "Help"]
     filtered = []
     for email in emails:
-        if any(k.lower() in email["subject"].lower() for k in keywords):
+        if is_support_subject(email["subject"]):
             filtered.append(email)
     return filtered
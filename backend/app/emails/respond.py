@@ -1,4 +1,7 @@
 from transformers import pipeline
+
+from app.extraction.budget import TokenBudget
+
 generator = pipeline("text-generation", model="distilgpt2")
 
 
@@ -14,7 +17,9 @@ def generate_response(email: dict, knowledge_base: dict = None) -> str:
         str: Generated response text.
     """
     subject = email.get("subject", "")
-    body = email.get("body", "")
+    # quotes/signature stripped, body cut to the stage's token budget
+    budget = TokenBudget(email.get("body", ""), generator.tokenizer, email.get("type"))
+    body = budget.text_for("response")
     sentiment = email.get("sentiment", "")
     priority = email.get("priority", "")
 
@@ -35,7 +40,7 @@ def generate_response(email: dict, knowledge_base: dict = None) -> str:
     try:
         response = generator(
             prompt,
-            max_length=200,
+            max_new_tokens=budget.max_new_tokens("response"),
             num_return_sequences=1,
             pad_token_id=50256,  # avoids warnings with GPT2-based models
         )
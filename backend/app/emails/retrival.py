@@ -1,7 +1,8 @@
 import imapclient
-import email
 from email.header import decode_header
 
+from app.emails.stream import MAX_CHUNK_BYTES, SIZE_BLOCK, parse_message, plan_chunks
+
 def decode_mime_words(s):
     """Decode MIME-encoded words in headers."""
     decoded = decode_header(s)
@@ -10,49 +11,32 @@ def decode_mime_words(s):
         for t in decoded
     )
 
-def fetch_emails(imap_host, email_user, email_pass):
+def iter_emails(imap_host, email_user, email_pass, max_bytes=MAX_CHUNK_BYTES):
+    """
+    Stream every message in INBOX as MailRecords, fetching BODY[] in chunks of
+    at most max_bytes (by RFC822.SIZE) so a full-mailbox import stays flat.
+    """
     server = imapclient.IMAPClient(imap_host, ssl=True)  # Use SSL
     server.login(email_user, email_pass)
-    server.select_folder("INBOX")
-
-    messages = server.search(["NOT", "DELETED"])
-    emails = []
-
-    for uid in messages:
-        raw_message = server.fetch([uid], ["BODY[]", "FLAGS"])
-        msg = email.message_from_bytes(raw_message[uid][b"BODY[]"])
+    try:
+        server.select_folder("INBOX")
+
+        messages = server.search(["NOT", "DELETED"])
+        for i in range(0, len(messages), SIZE_BLOCK):
+            block = messages[i:i + SIZE_BLOCK]
+            sizes = server.fetch(block, ["RFC822.SIZE"])
+            pairs = ((uid, sizes.get(uid, {}).get(b"RFC822.SIZE", 0)) for uid in block)
+            for chunk in plan_chunks(pairs, max_bytes):
+                raw_messages = server.fetch(chunk, ["BODY[]"])
+                for uid in chunk:
+                    raw = raw_messages.pop(uid, {}).get(b"BODY[]")
+                    if raw is not None:
+                        yield parse_message(raw, str(uid))
+    finally:
+        server.logout()
 
-        subject = decode_mime_words(msg.get("subject", ""))
-        sender = decode_mime_words(msg.get("from", ""))
-        date = msg.get("date")
-
-        body = ""
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                if content_type == "text/plain":
-                    body = part.get_payload(decode=True).decode(
-                        part.get_content_charset() or "utf-8", errors="ignore"
-                    )
-                    break
-            else:  # if no text/plain, fallback to text/html
-                for part in msg.walk():
-                    if part.get_content_type() == "text/html":
-                        body = part.get_payload(decode=True).decode(
-                            part.get_content_charset() or "utf-8", errors="ignore"
-                        )
-                        break
-        else:
-            body = msg.get_payload(decode=True).decode(
-                msg.get_content_charset() or "utf-8", errors="ignore"
-            )
-
-        emails.append({
-            "subject": subject,
-            "sender": sender,
-            "date": date,
-            "body": body,
-        })
-
-    server.logout()
-    return emails
+def fetch_emails(imap_host, email_user, email_pass):
+    return [
+        {"subject": r.subject, "sender": decode_mime_words(r.sender), "date": r.date, "body": r.body}
+        for r in iter_emails(imap_host, email_user, email_pass)
+    ]
@@ -0,0 +1,184 @@
+import email
+import os
+import re
+from email.header import decode_header, make_header
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Upper bound on raw message bytes requested in one FETCH (and on records
+# grouped by chunked()); messages bigger than this are fetched on their own.
+MAX_CHUNK_BYTES = int(os.environ.get("FETCH_MAX_CHUNK_BYTES", 8 * 1024 * 1024))
+MAX_CHUNK_MESSAGES = 500
+# How many message sizes are looked up per RFC822.SIZE FETCH.
+SIZE_BLOCK = 1000
+
+_size_re = re.compile(rb"(\d+) \(.*?RFC822\.SIZE (\d+)")
+
+
+class MailRecord:
+    """Compact parsed message; slots instead of a per-message dict."""
+
+    __slots__ = ("id", "subject", "sender", "date", "body", "triage")
+
+    def __init__(self, id: str, subject: str, sender: str, date: str, body: str, triage: Optional[str] = None):
+        self.id = id
+        self.subject = subject
+        self.sender = sender
+        self.date = date
+        self.body = body
+        # set by header triage when the body was deliberately not downloaded
+        self.triage = triage
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def size(self) -> int:
+        """Approximate payload size in bytes (for memory budgeting)."""
+        return sum(len(getattr(self, name) or "") for name in self.__slots__)
+
+    def __repr__(self):
+        return f"MailRecord(id={self.id!r}, subject={self.subject!r})"
+
+
+def clean_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def clean_body(text: str) -> str:
+    """Collapse whitespace within lines and drop blank lines, keeping line breaks."""
+    lines = (" ".join(line.split()) for line in (text or "").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def decode_header_value(value: str) -> str:
+    """RFC 2047 encoded header as text (all encoded words joined)."""
+    try:
+        return str(make_header(decode_header(value or "")))
+    except (LookupError, UnicodeDecodeError):  # unknown charset / bad bytes
+        return value or ""
+
+
+def parse_message(raw: bytes, fallback_id: str = "") -> MailRecord:
+    """
+    Parse raw RFC822 bytes into a MailRecord:
+    id (Message-ID), subject, sender, body, date
+    """
+    msg = email.message_from_bytes(raw)
+
+    # Message-ID (unique)
+    msg_id = msg.get("Message-ID") or msg.get("Message-Id") or f"<local-{fallback_id}>"
+
+    # Subject
+    subject = clean_text(decode_header_value(msg.get("Subject", "")))
+
+    # From
+    sender = msg.get("From", "")
+
+    # Date
+    date_raw = msg.get("Date", "") or ""
+    date_str = date_raw
+
+    # Body (prefer text/plain)
+    body = ""
+    if msg.is_multipart():
+        for part in msg.walk():
+            ctype = part.get_content_type()
+            cdisp = str(part.get("Content-Disposition") or "")
+            if ctype == "text/plain" and "attachment" not in cdisp.lower():
+                try:
+                    body = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
+                    break
+                except Exception:
+                    body = ""
+        # if still empty, try html part fallback
+        if not body:
+            for part in msg.walk():
+                if part.get_content_type() == "text/html":
+                    try:
+                        body = part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
+                        break
+                    except Exception:
+                        body = ""
+    else:
+        try:
+            body = msg.get_payload(decode=True).decode(msg.get_content_charset() or "utf-8", errors="ignore")
+        except Exception:
+            body = ""
+
+    # line breaks are kept so quote/signature markers can be found later
+    return MailRecord(msg_id.strip(), subject, sender, date_str, clean_body(body))
+
+
+def plan_chunks(sizes: Iterable[Tuple[bytes, int]], max_bytes: int = MAX_CHUNK_BYTES,
+                max_messages: int = MAX_CHUNK_MESSAGES) -> Iterator[List[bytes]]:
+    """Group (id, size) pairs, in order, into id lists of at most max_bytes each."""
+    chunk, total = [], 0
+    for msg_id, size in sizes:
+        if chunk and (total + size > max_bytes or len(chunk) >= max_messages):
+            yield chunk
+            chunk, total = [], 0
+        chunk.append(msg_id)
+        total += size
+    if chunk:
+        yield chunk
+
+
+def message_sizes(imap, ids: List[bytes]) -> Iterator[Tuple[bytes, int]]:
+    """(id, RFC822.SIZE) for each id, looked up SIZE_BLOCK ids per FETCH, in input order."""
+    for i in range(0, len(ids), SIZE_BLOCK):
+        block = ids[i:i + SIZE_BLOCK]
+        status, data = imap.fetch(b",".join(block), "(RFC822.SIZE)")
+        sizes = {}
+        if status == "OK":
+            for line in data:
+                match = _size_re.match(line if isinstance(line, bytes) else line[0])
+                if match:
+                    sizes[match.group(1)] = int(match.group(2))
+        for msg_id in block:
+            yield msg_id, sizes.get(msg_id, 0)
+
+
+def iter_messages(imap, ids: List[bytes], max_bytes: int = MAX_CHUNK_BYTES, spool=None) -> Iterator[MailRecord]:
+    """
+    Yield parsed messages for IMAP sequence numbers `ids` (in the given order)
+    on a selected imaplib connection, fetching them in chunks of at most
+    `max_bytes` raw bytes so memory stays flat regardless of mailbox size.
+    Raw bytes are dropped after parsing (or appended to `spool`).
+    """
+    return fetch_bodies(imap, message_sizes(imap, ids), max_bytes, spool)
+
+
+def fetch_bodies(imap, sizes: Iterable[Tuple[bytes, int]], max_bytes: int = MAX_CHUNK_BYTES,
+                 spool=None) -> Iterator[MailRecord]:
+    """iter_messages() for already known (id, RFC822.SIZE) pairs."""
+    for chunk in plan_chunks(sizes, max_bytes):
+        status, data = imap.fetch(b",".join(chunk), "(RFC822)")
+        if status != "OK":
+            continue
+        raws = {}
+        for part in data:
+            if isinstance(part, tuple):
+                raws[part[0].split(None, 1)[0]] = part[1]
+        del data
+        for msg_id in chunk:
+            raw = raws.pop(msg_id, None)
+            if raw is None:
+                continue
+            record = parse_message(raw, msg_id.decode())
+            if spool is not None:
+                spool.append(record.id, raw)
+            yield record
+
+
+def chunked(records: Iterable[MailRecord], max_bytes: int = MAX_CHUNK_BYTES,
+            max_messages: int = MAX_CHUNK_MESSAGES) -> Iterator[List[MailRecord]]:
+    """Group a record stream into lists bounded by total size and count."""
+    chunk, total = [], 0
+    for record in records:
+        size = record.size()
+        if chunk and (total + size > max_bytes or len(chunk) >= max_messages):
+            yield chunk
+            chunk, total = [], 0
+        chunk.append(record)
+        total += size
+    if chunk:
+        yield chunk
@@ -0,0 +1,210 @@
+import email
+from email.message import Message
+import re
+from email.utils import parseaddr
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.emails.filter import is_support_subject
+from app.emails.stream import (MAX_CHUNK_BYTES, SIZE_BLOCK, MailRecord, clean_text, decode_header_value,
+                               fetch_bodies)
+
+# Only these headers are downloaded to decide whether a body is needed.
+TRIAGE_HEADERS = [
+    "Message-ID", "From", "Subject", "Date",
+    "List-Unsubscribe", "List-Id", "Precedence", "Auto-Submitted",
+    "X-Autoreply", "X-Autorespond",
+]
+BULK_PRECEDENCE = {"bulk", "list", "junk"}
+# Local parts of addresses nobody reads replies from.
+NO_REPLY_SENDERS = re.compile(r"^(?:no[-_.]?reply|do[-_.]?not[-_.]?reply|mailer-daemon|postmaster|notifications?)@", re.I)
+
+# Reason -> `type` stored for the minimal record of a skipped message.
+SKIP_TYPES = {
+    "denylist": "blocked",
+    "auto-submitted": "automated",
+    "no-reply": "automated",
+    "bulk": "bulk",
+    "list": "bulk",
+}
+# Model invocations a downloaded email costs. extract_info always runs the
+# summary, sentiment and draft models; spaCy NER is skipped for some known
+# senders and classify_email's sentiment model only runs for support / help /
+# request mail, which triage can't tell without the body. So only a range.
+MIN_MODEL_CALLS_PER_EMAIL = 3
+MAX_MODEL_CALLS_PER_EMAIL = 5
+
+_fetch_re = re.compile(rb"^(\d+) \(")
+_size_re = re.compile(rb"RFC822\.SIZE (\d+)")
+
+
+def _matches(address: str, entries: Iterable[str]) -> bool:
+    """Entries are full addresses or '@domain'."""
+    domain = "@" + address.rpartition("@")[2]
+    return any(entry == address or entry == domain for entry in entries)
+
+
+class TriagePolicy:
+    """
+    Decides from headers alone whether a message needs its body downloaded
+    and run through the models. `allow` / `deny` hold addresses or '@domain'
+    entries; allowlisted senders are always processed in full.
+    """
+
+    def __init__(self, allow: Iterable[str] = (), deny: Iterable[str] = ()):
+        self.allow = {a.strip().lower() for a in allow}
+        self.deny = {d.strip().lower() for d in deny}
+
+    def decide(self, headers) -> Optional[str]:
+        """Skip reason (a SKIP_TYPES key), or None if the body is needed."""
+        sender = parseaddr(headers.get("From", ""))[1].lower()
+        if _matches(sender, self.allow):
+            return None
+        if _matches(sender, self.deny):
+            return "denylist"
+        auto = (headers.get("Auto-Submitted") or "no").strip().lower()
+        if auto != "no" or headers.get("X-Autoreply") or headers.get("X-Autorespond"):
+            return "auto-submitted"
+        if NO_REPLY_SENDERS.match(sender):
+            return "no-reply"
+        # mailing-list / bulk mail still gets through if the subject looks like support
+        if is_support_subject(decode_header_value(headers.get("Subject", ""))):
+            return None
+        if (headers.get("Precedence") or "").strip().lower() in BULK_PRECEDENCE:
+            return "bulk"
+        if headers.get("List-Unsubscribe") or headers.get("List-Id"):
+            return "list"
+        return None
+
+
+class TriageReport:
+    """What header triage saved over downloading and analysing everything."""
+
+    def __init__(self):
+        self.seen = 0
+        self.already_stored = 0
+        self.downloaded = 0
+        self.skipped: Dict[str, int] = {}
+        self.header_bytes = 0
+        self.body_bytes = 0
+        self.bytes_avoided = 0
+
+    def skip(self, reason: str, size: int):
+        self.skipped[reason] = self.skipped.get(reason, 0) + 1
+        self.bytes_avoided += size
+
+    def as_dict(self) -> Dict:
+        skipped = sum(self.skipped.values())
+        return {
+            "seen": self.seen,
+            "already_stored": self.already_stored,
+            "downloaded": self.downloaded,
+            "skipped": skipped,
+            "skipped_by_reason": dict(self.skipped),
+            "header_bytes": self.header_bytes,
+            "body_bytes": self.body_bytes,
+            # net of the header FETCH that triage itself costs
+            "bytes_avoided": self.bytes_avoided - self.header_bytes,
+            "model_calls_avoided": {
+                "min": skipped * MIN_MODEL_CALLS_PER_EMAIL,
+                "max": skipped * MAX_MODEL_CALLS_PER_EMAIL,
+            },
+        }
+
+
+def fetch_headers(imap, ids: List[bytes]) -> Iterator[Tuple[bytes, int, Message, int]]:
+    """(id, RFC822.SIZE, parsed triage headers, header bytes) per id, SIZE_BLOCK ids per FETCH."""
+    fields = " ".join(h.upper() for h in TRIAGE_HEADERS)
+    for i in range(0, len(ids), SIZE_BLOCK):
+        block = ids[i:i + SIZE_BLOCK]
+        status, data = imap.fetch(b",".join(block), f"(RFC822.SIZE BODY.PEEK[HEADER.FIELDS ({fields})])")
+        if status != "OK":
+            continue
+        found, current = {}, None
+        for part in data:
+            line = part[0] if isinstance(part, tuple) else part
+            match = _fetch_re.match(line)
+            if match:
+                current = match.group(1)
+                found[current] = [0, b""]
+            if current is None:
+                continue
+            size = _size_re.search(line)
+            if size:
+                found[current][0] = int(size.group(1))
+            if isinstance(part, tuple):
+                found[current][1] = part[1]
+        for msg_id in block:
+            if msg_id in found:
+                size, raw = found[msg_id]
+                yield msg_id, size, email.message_from_bytes(raw), len(raw)
+
+
+def message_id(msg_id: bytes, headers) -> str:
+    """Same id parse_message() would give the full message."""
+    return (headers.get("Message-ID") or headers.get("Message-Id") or f"<local-{msg_id.decode()}>").strip()
+
+
+def header_record(msg_id: bytes, headers, reason: str) -> MailRecord:
+    return MailRecord(
+        message_id(msg_id, headers),
+        clean_text(decode_header_value(headers.get("Subject", ""))),
+        headers.get("From", ""),
+        headers.get("Date", "") or "",
+        "",
+        triage=reason,
+    )
+
+
+def iter_triaged(imap, ids: List[bytes], policy: TriagePolicy, max_bytes: int = MAX_CHUNK_BYTES,
+                 spool=None, report: Optional[TriageReport] = None,
+                 stored: Optional[Callable[[List[str]], Set[str]]] = None) -> Iterator[MailRecord]:
+    """
+    Like stream.iter_messages(), but first FETCHes only the triage headers of
+    each block of ids. Messages the policy skips are yielded as header-only
+    MailRecords with `triage` set to the reason; only the rest have their
+    bodies downloaded (and spooled). Within a block, skipped records come first.
+    `stored(message_ids) -> set` (e.g. db.stored_ids) names messages that are
+    already stored; those are neither downloaded nor yielded.
+    """
+    report = report if report is not None else TriageReport()
+    for i in range(0, len(ids), SIZE_BLOCK):
+        block = list(fetch_headers(imap, ids[i:i + SIZE_BLOCK]))
+        known = stored([message_id(msg_id, headers) for msg_id, _, headers, _ in block]) if stored else set()
+        keep = []
+        for msg_id, size, headers, header_len in block:
+            report.seen += 1
+            report.header_bytes += header_len
+            if message_id(msg_id, headers) in known:
+                report.already_stored += 1
+                report.bytes_avoided += size
+                continue
+            reason = policy.decide(headers)
+            if reason:
+                report.skip(reason, size)
+                yield header_record(msg_id, headers, reason)
+            else:
+                keep.append((msg_id, size))
+        del block
+        report.body_bytes += sum(size for _, size in keep)
+        for record in fetch_bodies(imap, keep, max_bytes, spool):
+            report.downloaded += 1
+            yield record
+
+
+def skipped_record(mail: MailRecord) -> Dict:
+    """Minimal DB record for a message triage decided not to process."""
+    return {
+        "id": mail.id,
+        "sender": mail.sender,
+        "subject": mail.subject,
+        "body": None,
+        "date": mail.date,
+        "type": SKIP_TYPES.get(mail.triage, "bulk"),
+        "sentiment": "Neutral",
+        "priority": "Not urgent",
+        "phone": None,
+        "alt_email": None,
+        "requirements": None,
+        "draft_response": None,
+        "processed": 1,
+    }
@@ -0,0 +1,137 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+# Flush when this many requests are queued, or this long after the first one.
+MAX_BATCH_SIZE = int(os.environ.get("INFER_MAX_BATCH_SIZE", 16))
+MAX_WAIT_MS = float(os.environ.get("INFER_MAX_WAIT_MS", 5))
+
+QUEUE_WAIT_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 250, 500, 1000]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style) with count and sum."""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, n in zip([str(b) for b in self.buckets] + ["+Inf"], self.counts):
+                cumulative += n
+                buckets[bound] = cumulative
+            return {"buckets": buckets, "count": self.count, "sum": round(self.sum, 3)}
+
+
+class MicroBatcher:
+    """
+    Collects single requests from concurrent callers and runs them through
+    `batch_fn(list_of_items) -> list_of_results` together.
+
+    A batch is flushed when `max_batch_size` items are queued or `max_wait_ms`
+    after its first item arrived, whichever comes first. Each caller gets a
+    Future for its own result. Up to `concurrency` batches run at once (e.g.
+    one per ExtractionPool worker).
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: float = MAX_WAIT_MS, concurrency: int = 1):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_BUCKETS_MS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._slots = threading.Semaphore(concurrency)
+        self._closed = False
+        self._thread = threading.Thread(target=self._collect, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            # don't start a batch before a flush slot is free, so requests
+            # keep accumulating while all slots are busy
+            self._slots.acquire()
+            batch = [first]
+            deadline = first[2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._queue.put(None)  # let the outer loop stop after this batch
+                    break
+                batch.append(entry)
+            self._executor.submit(self._flush, batch)
+
+    def _flush(self, batch: List[tuple]):
+        try:
+            now = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait_ms.observe((now - enqueued) * 1000)
+            # callers may have given up (e.g. asyncio.wrap_future cancels the
+            # future with its task); setting a result on those would raise
+            batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not batch:
+                return
+            self.batch_size.observe(len(batch))
+            try:
+                results = list(self.batch_fn([item for item, _, _ in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                return
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": self._queue.qsize(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,144 @@
+import re
+import time
+from typing import Dict, List, Optional
+
+# Max input tokens of the email body each stage gets to see.
+STAGE_INPUT_TOKENS = {
+    "summary": 384,
+    "sentiment": 256,
+    "draft": 256,
+    "response": 384,
+}
+
+# (min, max) generated tokens per stage and how many output tokens each
+# input token "buys" in between.
+OUTPUT_TOKENS = {
+    "summary": (24, 150),
+    "draft": (40, 200),
+    "response": (48, 200),
+}
+OUTPUT_RATIO = {
+    "summary": 0.4,
+    "draft": 0.5,
+    "response": 0.5,
+}
+
+# Queries and spam get shorter answers than support/help/request mail.
+TYPE_OUTPUT_SCALE = {
+    "support": 1.0,
+    "help": 1.0,
+    "request": 1.0,
+    "query": 0.75,
+    "spam": 0.25,
+}
+MIN_NEW_TOKENS = 16
+
+# Everything from the first of these markers onwards is quoted history.
+# They are line-anchored, so strip_quotes() needs the body's line breaks.
+QUOTE_MARKERS = [
+    r"-{2,}\s*Original Message\s*-{2,}",
+    r"-{2,}\s*Forwarded message\s*-{2,}",
+    r"^From:\s.+?\bSent:\s",
+    r"^>",
+]
+# Reply header ("On Mon, 3 Jun 2024, Jane <j@x.com> wrote:"); case-sensitive
+# so that "... on the portal and your agent wrote: ..." is left alone.
+REPLY_HEADER = r"^On\s.{5,200}?\swrote:\s*$"
+# Everything from the first of these markers onwards is a signature.
+SIGNATURE_MARKERS = [
+    r"^--\s*$",
+    r"\bSent from my \w+",
+    r"^(?:Best regards|Kind regards|Warm regards|Regards|Thanks and regards|Sincerely|Cheers),?\s*$",
+]
+
+_quote_re = re.compile("|".join(f"(?:{m})" for m in QUOTE_MARKERS), re.IGNORECASE | re.MULTILINE)
+_reply_re = re.compile(REPLY_HEADER, re.MULTILINE)
+_signature_re = re.compile("|".join(f"(?:{m})" for m in SIGNATURE_MARKERS), re.IGNORECASE | re.MULTILINE)
+
+
+def _cut(text: str, pattern) -> str:
+    match = pattern.search(text)
+    if match and match.start() > 0:
+        text = text[:match.start()]
+    return text
+
+
+def strip_quotes(text: str) -> str:
+    """Drop quoted replies / forwarded history; the sender's signature stays."""
+    return _cut(_cut(text or "", _quote_re), _reply_re).strip()
+
+
+def strip_signature(text: str) -> str:
+    return _cut(text or "", _signature_re).strip()
+
+
+def strip_quoted(text: str) -> str:
+    """
+    Drop quoted replies and the sender's signature from an email body.
+    Pass the body before whitespace collapsing; the result keeps its lines.
+    """
+    return strip_signature(strip_quotes(text))
+
+
+def max_new_tokens(stage: str, input_tokens: int, email_type: Optional[str] = None) -> int:
+    """Output length cap for a stage, scaled by input size and email type."""
+    lo, hi = OUTPUT_TOKENS[stage]
+    n = lo + int(input_tokens * OUTPUT_RATIO[stage])
+    n = int(n * TYPE_OUTPUT_SCALE.get(email_type, 1.0))
+    return max(MIN_NEW_TOKENS, min(hi, n))
+
+
+class TokenBudget:
+    """
+    Tokenizes a (quote/signature stripped) email once and hands out
+    per-stage slices of the same token ids, so summary, sentiment and draft
+    don't each re-tokenize or re-truncate the raw text by characters.
+
+    Without a tokenizer, whitespace-separated words stand in for tokens.
+    """
+
+    def __init__(self, text: str, tokenizer=None, email_type: Optional[str] = None):
+        self.tokenizer = tokenizer
+        self.email_type = email_type
+        self.text = " ".join(strip_quoted(text).split())
+        if tokenizer is not None:
+            self.ids = tokenizer(self.text, add_special_tokens=False)["input_ids"]
+        else:
+            self.ids = self.text.split()
+        self.usage: Dict[str, Dict] = {}
+        self._texts: Dict[str, str] = {}
+
+    def ids_for(self, stage: str) -> List:
+        return self.ids[:STAGE_INPUT_TOKENS[stage]]
+
+    def text_for(self, stage: str) -> str:
+        """The stage's token slice decoded back to text (cached per stage)."""
+        if stage not in self._texts:
+            ids = self.ids_for(stage)
+            if len(ids) == len(self.ids):
+                self._texts[stage] = self.text
+            elif self.tokenizer is not None:
+                self._texts[stage] = self.tokenizer.decode(ids, skip_special_tokens=True)
+            else:
+                self._texts[stage] = " ".join(ids)
+        return self._texts[stage]
+
+    def max_new_tokens(self, stage: str) -> int:
+        return max_new_tokens(stage, len(self.ids_for(stage)), self.email_type)
+
+    def record(self, stage: str, input_tokens: int, output_tokens: int = 0, started: Optional[float] = None,
+               batch_size: int = 1):
+        """
+        Store token counts (and elapsed seconds since `started`) for a stage.
+        For batched calls the seconds are those of the whole batch.
+        """
+        entry = {"input_tokens": input_tokens, "output_tokens": output_tokens}
+        if started is not None:
+            entry["seconds"] = round(time.perf_counter() - started, 4)
+        if batch_size > 1:
+            entry["batch_size"] = batch_size
+        self.usage[stage] = entry
+        return entry
+
+    def report(self) -> Dict[str, Dict]:
+        return {"email_tokens": len(self.ids), **self.usage}
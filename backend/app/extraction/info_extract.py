@@ -1,9 +1,14 @@
 import re
-from typing import Dict, Any
+import time
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
 from transformers import pipeline
 import spacy
+import torch
 import logging
 
+from app.extraction.budget import TokenBudget, strip_quotes
+
 # Logging setup
 logging.basicConfig(
     filename="email_extraction.log",
@@ -27,6 +32,8 @@ except Exception as e:
     sentiment_model = None
 
 nlp = spacy.load("en_core_web_sm")
+# Characters of an email handed to the spaCy NER fallback.
+NER_MAX_CHARS = 2000
 
 def ner_fallback(text: str) -> dict:
     doc = nlp(text)
@@ -35,34 +42,91 @@ def ner_fallback(text: str) -> dict:
     orgs = [ent.text for ent in doc.ents if ent.label_ == "ORG"]
     return {"names": names, "dates": dates, "orgs": orgs}
 
-def generate_summary(email_text: str) -> str:
-    if not email_text.strip() or not summarizer:
-        return "[Summarizer not available]"
+def _encode(text: str) -> List[int]:
+    return summarizer.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+@lru_cache(maxsize=32)
+def _encode_cached(text: str) -> tuple:
+    # fixed prompt fragments are tokenized once per process
+    return tuple(_encode(text))
+
+def _generate_batch(items: List[tuple], stage: str) -> List[str]:
+    """
+    Run the summarizer model once over a batch of (prefix_ids, budget,
+    suffix_ids) prompts built around each budget's slice for `stage`.
+    """
+    started = time.perf_counter()
+    tokenizer = summarizer.tokenizer
+    seqs = [list(prefix) + budget.ids_for(stage) + list(suffix) + [tokenizer.eos_token_id]
+            for prefix, budget, suffix in items]
+    width = max(len(seq) for seq in seqs)
+    device = summarizer.model.device
+    input_ids = torch.tensor([seq + [tokenizer.pad_token_id] * (width - len(seq)) for seq in seqs], device=device)
+    attention_mask = torch.tensor([[1] * len(seq) + [0] * (width - len(seq)) for seq in seqs], device=device)
+    caps = [budget.max_new_tokens(stage) for _, budget, _ in items]
+    output = summarizer.model.generate(
+        input_ids=input_ids,
+        attention_mask=attention_mask,
+        max_new_tokens=max(caps),
+        do_sample=False,
+    )
+    texts = []
+    for seq, out, cap, (_, budget, _) in zip(seqs, output, caps, items):
+        # greedy decoding: the first `cap` tokens match an unbatched run
+        out = out[:cap + 1]
+        budget.record(stage, len(seq), int((out != tokenizer.pad_token_id).sum()), started, len(items))
+        texts.append(tokenizer.decode(out, skip_special_tokens=True).strip())
+    return texts
+
+def make_budget(email_text: str, email_type: Optional[str] = None) -> TokenBudget:
+    tokenizer = summarizer.tokenizer if summarizer else None
+    return TokenBudget(email_text, tokenizer, email_type)
+
+SUMMARY_PROMPT = (
+    "Summarize this email in 2-3 sentences. "
+    "Focus on main issue, requests, important details:\n\n"
+)
+
+def generate_summaries(budgets: List[TokenBudget]) -> List[str]:
+    summaries = ["[Summarizer not available]"] * len(budgets)
+    todo = [i for i, budget in enumerate(budgets) if budget.text]
+    if not summarizer or not todo:
+        return summaries
     try:
-        prompt = (
-            "Summarize this email in 2-3 sentences. "
-            "Focus on main issue, requests, important details:\n\n"
-            f"{email_text}"
-        )
-        result = summarizer(prompt, max_new_tokens=150, do_sample=False)
-        return result[0]["generated_text"].strip()
+        prefix = _encode_cached(SUMMARY_PROMPT)
+        texts = _generate_batch([(prefix, budgets[i], ()) for i in todo], "summary")
+        for i, text in zip(todo, texts):
+            summaries[i] = text
     except Exception as e:
-        return f"[Error generating summary: {e}]"
+        for i in todo:
+            summaries[i] = f"[Error generating summary: {e}]"
+    return summaries
 
-def analyze_sentiment(email_text: str) -> str:
-    if not sentiment_model:
-        return "Neutral"
+def generate_summary(email_text: str, budget: Optional[TokenBudget] = None) -> str:
+    return generate_summaries([budget or make_budget(email_text)])[0]
+
+def analyze_sentiments(budgets: List[TokenBudget]) -> List[str]:
+    if not sentiment_model or not budgets:
+        return ["Neutral"] * len(budgets)
     try:
-        result = sentiment_model(email_text[:512])
-        label = result[0]["label"].lower()
+        started = time.perf_counter()
+        results = sentiment_model([b.text_for("sentiment") for b in budgets], truncation=True, batch_size=len(budgets))
+    except:
+        return ["Neutral"] * len(budgets)
+    sentiments = []
+    for budget, result in zip(budgets, results):
+        budget.record("sentiment", len(budget.ids_for("sentiment")), 0, started, len(budgets))
+        label = result["label"].lower()
         if "neg" in label:
-            return "Negative"
+            sentiments.append("Negative")
         elif "pos" in label:
-            return "Positive"
+            sentiments.append("Positive")
         else:
-            return "Neutral"
-    except:
-        return "Neutral"
+            sentiments.append("Neutral")
+    return sentiments
+
+def analyze_sentiment(email_text: str, budget: Optional[TokenBudget] = None) -> str:
+    return analyze_sentiments([budget or make_budget(email_text)])[0]
 
 def detect_priority(email_text: str) -> str:
     urgent_keywords = ["urgent", "immediately", "asap", "critical", "cannot", "help", "fail", "problem"]
@@ -72,68 +136,118 @@ def detect_priority(email_text: str) -> str:
             return "Urgent"
     return "Normal"
 
-def generate_draft_response(email: Dict[str, Any], summary: str, sentiment: str, priority: str) -> str:
+def generate_draft_responses(emails: List[Dict[str, Any]], summaries: List[str], sentiments: List[str],
+                             priorities: List[str], budgets: List[TokenBudget]) -> List[str]:
     if not summarizer:
-        return "[Draft response unavailable]"
+        return ["[Draft response unavailable]"] * len(emails)
     try:
-        sender = email.get("name") or "Customer"
-        body = email.get("snippet", "")
-        prompt = (
-            f"Compose a professional, friendly email response.\n"
-            f"Sender Name: {sender}\n"
-            f"Email Content: {body}\n"
-            f"Summary: {summary}\n"
-            f"Sentiment: {sentiment}\n"
-            f"Priority: {priority}\n\n"
-            f"Respond in 2-3 sentences, acknowledge issue, provide guidance."
-        )
-        result = summarizer(prompt, max_new_tokens=200, do_sample=False)
-        return result[0]["generated_text"].strip()
+        items = []
+        for email, summary, sentiment, priority, budget in zip(emails, summaries, sentiments, priorities, budgets):
+            sender = email.get("name") or "Customer"
+            prefix = _encode(
+                f"Compose a professional, friendly email response.\n"
+                f"Sender Name: {sender}\n"
+                f"Email Content: "
+            )
+            suffix = _encode(
+                f"\nSummary: {summary}\n"
+                f"Sentiment: {sentiment}\n"
+                f"Priority: {priority}\n\n"
+                f"Respond in 2-3 sentences, acknowledge issue, provide guidance."
+            )
+            items.append((prefix, budget, suffix))
+        return _generate_batch(items, "draft") if items else []
     except:
-        return "[Error generating draft response]"
-
-def extract_info(email: Dict[str, Any]) -> Dict[str, Any]:
-    text = f"{email.get('subject','')}\n{email.get('snippet','')}"
-
-    # Regex patterns
-    name_pattern = r"(?:Hi|Hello|Dear)\s+([A-Z][a-z]+(?:\s[A-Z][a-z]+)*)"
-    order_pattern = r"(?:order|Order|ORDER)\s*ID[:\s\-]*([A-Za-z0-9\-]+)"
-    phone_pattern = r"\+?\d{2,4}[-.\s]?\d{6,12}|\b\d{10}\b"
-    email_pattern = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
-    date_pattern = (
-        r"\b(?:\d{1,2}[/-]\d{1,2}[/-]\d{2,4}"
-        r"|(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s?\d{1,2},?\s?\d{4})"
-    )
+        return ["[Error generating draft response]"] * len(emails)
+
+def generate_draft_response(email: Dict[str, Any], summary: str, sentiment: str, priority: str,
+                            budget: Optional[TokenBudget] = None) -> str:
+    budget = budget or make_budget(email.get("body") or email.get("snippet", ""), email.get("type"))
+    return generate_draft_responses([email], [summary], [sentiment], [priority], [budget])[0]
+
+# Regex patterns
+name_pattern = re.compile(r"(?:Hi|Hello|Dear)\s+([A-Z][a-z]+(?:\s[A-Z][a-z]+)*)")
+order_pattern = re.compile(r"(?:order|Order|ORDER)\s*ID[:\s\-]*([A-Za-z0-9\-]+)", re.IGNORECASE)
+phone_pattern = re.compile(r"\+?\d{2,4}[-.\s]?\d{6,12}|\b\d{10}\b")
+email_pattern = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+date_pattern = re.compile(
+    r"\b(?:\d{1,2}[/-]\d{1,2}[/-]\d{2,4}"
+    r"|(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s?\d{1,2},?\s?\d{4})"
+)
 
-    name_match = re.search(name_pattern, text)
-    order_match = re.search(order_pattern, text, re.IGNORECASE)
-    phone_match = re.search(phone_pattern, text)
-    email_match = re.search(email_pattern, text)
-    date_match = re.search(date_pattern, text)
+def extract_fields(text: str, ner_text: Optional[str] = None, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Contact/order fields via regex with spaCy NER as fallback for name and
+    date. CPU-only (no transformer models); `ner_text` bounds the NER input.
+    With the sender's stored `profile`, its name (the From display name) is
+    preferred over the greeting regex, which captures the addressee ("Hi
+    Team"); phone / email missing from the text are taken from it. NER is
+    skipped when it has nothing left to add: the profile has the name and
+    the regex found the date (a profile can't supply dates). `ner_skipped`
+    tells which happened.
+    """
+    name_match = name_pattern.search(text)
+    order_match = order_pattern.search(text)
+    phone_match = phone_pattern.search(text)
+    email_match = email_pattern.search(text)
+    date_match = date_pattern.search(text)
+
+    profile = profile or {}
+    if profile.get("name"):
+        name_match = profile["name"]
 
     # Fallback NER
-    ner_results = ner_fallback(text)
-    if not name_match and ner_results["names"]:
-        name_match = ner_results["names"][0]
-    if not date_match and ner_results["dates"]:
-        date_match = ner_results["dates"][0]
-
-    summary = generate_summary(text[:1000])
-    sentiment = analyze_sentiment(text)
-    priority = detect_priority(text)
-    draft_response = generate_draft_response(email, summary, sentiment, priority)
-
-    extracted = {
+    ner_skipped = bool(profile.get("name")) and bool(date_match)
+    if not ner_skipped:
+        ner_results = ner_fallback(text if ner_text is None else ner_text)
+        if not name_match and ner_results["names"]:
+            name_match = ner_results["names"][0]
+        if not date_match and ner_results["dates"]:
+            date_match = ner_results["dates"][0]
+
+    return {
         "name": name_match.group(1) if hasattr(name_match, "group") else name_match,
         "order_id": order_match.group(1) if order_match else None,
-        "phone": phone_match.group(0) if phone_match else None,
-        "email": email_match.group(0) if email_match else None,
+        "phone": phone_match.group(0) if phone_match else profile.get("phone"),
+        "email": email_match.group(0) if email_match else profile.get("alt_email"),
         "date": date_match.group(0) if hasattr(date_match, "group") else date_match,
-        "summary": summary,
-        "sentiment": sentiment,
-        "priority": priority,
-        "draft_response": draft_response
+        "ner_skipped": ner_skipped,
     }
 
-    log_email_processing(email, extracted)
-    return extracted
+def extract_info_batch(emails: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    extract_info for many emails at once: regex/NER per email, but each model
+    stage (summary, sentiment, draft) runs as one batched call. An email's
+    optional "profile" (its sender's stored profile) is used by extract_fields.
+    """
+    texts = [f"{email.get('subject','')}\n{email.get('body') or email.get('snippet', '')}" for email in emails]
+    # tokenize each full body once (quotes/signature stripped); every model
+    # stage below takes its own token-budgeted slice of it
+    budgets = [make_budget(text, email.get("type")) for email, text in zip(emails, texts)]
+    # contact fields: quoted history is dropped (it holds our own signature),
+    # the sender's signature is kept (it carries their phone and name)
+    own_texts = [strip_quotes(text) for text in texts]
+    fields = [extract_fields(text, text[:NER_MAX_CHARS], email.get("profile"))
+              for email, text in zip(emails, own_texts)]
+
+    summaries = generate_summaries(budgets)
+    sentiments = analyze_sentiments(budgets)
+    priorities = [detect_priority(budget.text) for budget in budgets]
+    drafts = generate_draft_responses(emails, summaries, sentiments, priorities, budgets)
+
+    results = []
+    for i, email in enumerate(emails):
+        extracted = {
+            **fields[i],
+            "summary": summaries[i],
+            "sentiment": sentiments[i],
+            "priority": priorities[i],
+            "draft_response": drafts[i],
+            "token_usage": budgets[i].report()
+        }
+        log_email_processing(email, extracted)
+        results.append(extracted)
+    return results
+
+def extract_info(email: Dict[str, Any]) -> Dict[str, Any]:
+    return extract_info_batch([email])[0]
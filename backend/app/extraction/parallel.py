@@ -0,0 +1,72 @@
+import gc
+import multiprocessing as mp
+import os
+from typing import Callable, Iterable, Iterator, Optional
+
+# Worker processes and emails per IPC round-trip; override via env.
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", os.cpu_count() or 1))
+EXTRACT_CHUNKSIZE = int(os.environ.get("EXTRACT_CHUNKSIZE", 16))
+
+
+def _init_worker():
+    # one intra-op thread per worker, otherwise N workers x N torch threads
+    # oversubscribe the cores
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+
+class ExtractionPool:
+    """
+    Process pool for CPU-bound per-email work (regex, spaCy NER, classifiers).
+
+    Workers are forked from the current process, so the models that
+    `app.extraction.info_extract` / `app.classifier` load at import time are
+    shared copy-on-write instead of being loaded again per worker. Create the
+    pool after those imports and before running inference in the parent.
+
+    Falls back to running in-process when workers <= 1 or the platform has
+    no fork start method (e.g. Windows).
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunksize: Optional[int] = None):
+        self.workers = EXTRACT_WORKERS if workers is None else workers
+        self.chunksize = EXTRACT_CHUNKSIZE if chunksize is None else chunksize
+        self._pool = None
+        if self.workers > 1 and "fork" in mp.get_all_start_methods():
+            # keep already-loaded objects out of the GC's reach so refcount /
+            # gc bookkeeping in the children doesn't un-share their pages
+            gc.freeze()
+            self._pool = mp.get_context("fork").Pool(self.workers, initializer=_init_worker)
+
+    def imap(self, func: Callable, items: Iterable) -> Iterator:
+        """Apply `func` to each item; results stream back in input order."""
+        if self._pool is None:
+            return map(func, items)
+        return self._pool.imap(func, items, chunksize=self.chunksize)
+
+    @property
+    def concurrency(self) -> int:
+        """How many calls can usefully run at the same time."""
+        return self.workers if self._pool is not None else 1
+
+    def call(self, func: Callable, *args):
+        """Run one `func(*args)` on a worker (blocking); thread-safe."""
+        if self._pool is None:
+            return func(*args)
+        return self._pool.apply(func, args)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            gc.unfreeze()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
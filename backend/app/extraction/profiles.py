@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict
+from email.utils import parseaddr
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app import db
+from app.emails.stream import clean_text, decode_header_value
+
+# Sender profiles kept in memory in front of the sender_profiles table.
+PROFILE_CACHE_SIZE = int(os.environ.get("PROFILE_CACHE_SIZE", 10000))
+
+# extract_info result keys that feed a profile (plus whether NER ran); the
+# profile name comes from the From display name instead.
+CONTACT_FIELDS = ["phone", "email", "order_id", "ner_skipped"]
+
+
+def display_name(sender: Optional[str]) -> Optional[str]:
+    """'"Doe, Jane" <jane@example.com>' -> 'Doe, Jane' (None if there is none)."""
+    name = clean_text(decode_header_value(parseaddr(sender or "")[0])).strip("'\"")
+    return name or None
+
+
+def normalize_sender(sender: Optional[str]) -> str:
+    """'Jane Doe <Jane.Doe@Example.com>' -> 'jane.doe@example.com'."""
+    return parseaddr(sender or "")[1].strip().lower()
+
+
+class SenderProfiles:
+    """
+    LRU cache over db sender_profiles, read-through on lookup() and
+    write-through on observe(). Keep one instance in the process that stores
+    extraction results: ExtractionPool workers don't touch it, they get each
+    email's profile passed in with the email (see extract_fields()).
+    """
+
+    def __init__(self, maxsize: int = PROFILE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[str, Optional[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0          # a stored profile was found
+        self.cache_hits = 0    # answered without touching the DB
+        self.extractions = 0
+        self.ner_skipped = 0
+
+    def _put(self, sender: str, profile: Optional[Dict]):
+        self._cache[sender] = profile
+        self._cache.move_to_end(sender)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def lookup(self, senders: List[str]) -> List[Optional[Dict]]:
+        """Profile (or None) per raw From header, with one DB query for all cache misses."""
+        keys = [normalize_sender(s) for s in senders]
+        with self._lock:
+            cached = {k for k in keys if k in self._cache}
+            missing = {k for k in keys if k and k not in cached}
+        loaded = db.get_sender_profiles(missing) if missing else {}
+        with self._lock:
+            for key in missing:
+                # unknown senders are cached too; observe() replaces the entry
+                self._put(key, loaded.get(key))
+            profiles = []
+            for key in keys:
+                profile = self._cache.get(key) if key else None
+                if key in cached:
+                    self._cache.move_to_end(key)
+                    self.cache_hits += 1
+                self.lookups += 1
+                self.hits += profile is not None
+                profiles.append(profile)
+        return profiles
+
+    def observe(self, results: Iterable[Tuple[str, str, Dict[str, Any]]]):
+        """
+        Fold (Message-ID, raw From header, extract_info result) triples into
+        the stored profiles; a message already folded in is not counted again.
+        """
+        updates = []
+        for message_id, sender, info in results:
+            self.extractions += 1
+            self.ner_skipped += bool(info.get("ner_skipped"))
+            key = normalize_sender(sender)
+            if key:
+                updates.append({
+                    "sender": key,
+                    "message_id": message_id,
+                    # not info["name"]: the greeting regex names the addressee
+                    "name": display_name(sender),
+                    "phone": info.get("phone"),
+                    "alt_email": info.get("email"),
+                    "order_id": info.get("order_id"),
+                })
+        if not updates:
+            return
+        profiles = db.update_sender_profiles(updates)
+        with self._lock:
+            for key, profile in profiles.items():
+                self._put(key, profile)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "cache_hits": self.cache_hits,
+            "cached": len(self._cache),
+            "extractions": self.extractions,
+            "ner_calls": self.extractions - self.ner_skipped,
+            "ner_calls_avoided": self.ner_skipped,
+        }
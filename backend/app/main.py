@@ -1,11 +1,18 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+import asyncio
+import hashlib
 import json
 import os
+import time
 
 from app.gmail_fetch import fetch_emails
-from app.extraction.info_extract import extract_info
+from app.extraction.info_extract import extract_info_batch
+from app.extraction.parallel import ExtractionPool
+from app.extraction.batching import MicroBatcher
+from app.extraction.profiles import SenderProfiles
+from app import db
 
 app = FastAPI(title="AI Email Assistant")
 
@@ -18,24 +25,136 @@ creds_path = os.path.join(os.path.dirname(__file__), "credentials.json")
 with open(creds_path) as f:
     creds = json.load(f)
 
+# --------- Read cache ---------
+# Dashboard reads are served from memory for READ_CACHE_TTL seconds; after
+# that the (O(1)) stats version is checked and the entry reused if unchanged.
+READ_CACHE_TTL = 5
+READ_CACHE_MAX = 256
+_read_cache: Dict[str, Any] = {}
+
+def _cached_read(key: str, loader):
+    now = time.monotonic()
+    entry = _read_cache.get(key)
+    if entry and now - entry["checked"] < READ_CACHE_TTL:
+        return entry["version"], entry["payload"]
+    version = db.get_stats_version()
+    if entry and entry["version"] == version:
+        entry["checked"] = now
+        return version, entry["payload"]
+    payload = loader()
+    if len(_read_cache) >= READ_CACHE_MAX:
+        _read_cache.clear()
+    _read_cache[key] = {"version": version, "payload": payload, "checked": now}
+    return version, payload
+
+def _etag(key: str, version: int) -> str:
+    return 'W/"%s-%s"' % (version, hashlib.md5(key.encode()).hexdigest()[:12])
+
+def _conditional(request: Request, response: Response, key: str, version: int, payload):
+    etag = _etag(key, version)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={READ_CACHE_TTL}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return payload
+
+# --------- Extraction pool + micro-batching ---------
+# The pool is forked once at startup, after the models are loaded and before
+# any request runs inference, so workers share the weights copy-on-write.
+# Emails from concurrent /fetch calls are merged into batches by the
+# MicroBatcher; each batch runs as one extract_info_batch call on a worker.
+extraction_pool: Optional[ExtractionPool] = None
+batcher: Optional[MicroBatcher] = None
+# Sender profiles are looked up and updated here, not in the workers.
+profiles = SenderProfiles()
+
+def _extract_batch(emails: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return extraction_pool.call(extract_info_batch, emails)
+
+@app.on_event("startup")
+def start_extraction():
+    global extraction_pool, batcher
+    db.init_db()  # creates tables added since the DB was made (e.g. sender_profiles)
+    extraction_pool = ExtractionPool()
+    batcher = MicroBatcher(_extract_batch, concurrency=extraction_pool.concurrency)
+
+@app.on_event("shutdown")
+def stop_extraction():
+    if batcher is not None:
+        batcher.close()
+    if extraction_pool is not None:
+        extraction_pool.close()
+
 # --------- Routes ---------
 @app.post("/fetch")
 async def fetch_emails_route(request: FetchRequest) -> Dict[str, Any]:
     try:
-        emails = fetch_emails(
-            creds["imap_host"],
-            creds["email_user"],
-            creds["email_pass"],
-            limit=request.limit
-        )
+        # blocking IMAP / SQLite work stays off the event loop, so concurrent
+        # /fetch calls overlap and their emails meet in the same batches
+        emails = await asyncio.to_thread(fetch_emails, n=request.limit)
         if not emails:
             return {"results": [], "message": "No emails found."}
 
+        known = await asyncio.to_thread(profiles.lookup, [email.get("sender") for email in emails])
+        infos = await asyncio.gather(*(
+            asyncio.wrap_future(batcher.submit({**email, "profile": profile}))
+            for email, profile in zip(emails, known)
+        ))
+        # /fetch re-reads the latest mails on every call; observe() counts each Message-ID once
+        await asyncio.to_thread(profiles.observe, [
+            (email.get("id"), email.get("sender"), info) for email, info in zip(emails, infos)
+        ])
         results = []
-        for email in emails:
-            info = extract_info(email)
+        for email, info in zip(emails, infos):
             results.append({**email, **info})
 
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/metrics/batching")
+def batching_metrics_route() -> Dict[str, Any]:
+    """Queue-wait and batch-size histograms of the inference micro-batcher."""
+    return batcher.stats()
+
+@app.get("/metrics/profiles")
+def profile_metrics_route() -> Dict[str, Any]:
+    """Sender profile cache hit rate and NER calls avoided."""
+    return profiles.stats()
+
+@app.get("/stats")
+def stats_route(request: Request, response: Response):
+    version, payload = _cached_read("stats", db.get_stats)
+    return _conditional(request, response, "stats", version, payload)
+
+@app.get("/emails")
+def list_emails_route(
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    fields: Optional[str] = None,
+    include_body: bool = False,
+    before: Optional[str] = None,
+    type: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    priority: Optional[str] = None,
+    processed: Optional[int] = None,
+):
+    limit = max(1, min(limit, 500))
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    if include_body:
+        field_list = (field_list or [c for c in db.EMAIL_COLUMNS if c != "body"]) + ["body"]
+    filters = {"type": type, "sentiment": sentiment, "priority": priority, "processed": processed}
+    key = "emails?" + str(request.query_params)
+
+    def load():
+        rows = db.list_emails(limit, field_list, before, filters)
+        next_cursor = f"{rows[-1]['received_at']}|{rows[-1]['id']}" if len(rows) == limit else None
+        return {"results": rows, "next": next_cursor}
+
+    try:
+        version, payload = _cached_read(key, load)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _conditional(request, response, key, version, payload)
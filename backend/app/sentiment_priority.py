@@ -1,19 +1,47 @@
-import pandas as pd
-from app.gmail_fetch import fetch_emails
-from app.sentiment_priority import classify_email
-from openpyxl import load_workbook
+import csv
+import os
+import tempfile
+from app.gmail_fetch import iter_emails
+from app.classifier import classify_email
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
 
-# Step 1: Fetch emails
-print("Fetching emails...")
-emails = fetch_emails(n=20)
-print(f"Total emails fetched: {len(emails)}")
+# Streams emails into a write-only workbook, so memory stays flat no matter
+# how many emails are exported (EXPORT_N=0 exports the whole inbox).
+EXPORT_N = int(os.environ.get("EXPORT_N", 20))
+TYPES = ["support", "query", "help", "request", "spam"]
+COLUMNS = ["subject", "sender", "date", "body", "type", "sentiment", "priority"]
+
+wb = Workbook(write_only=True)
+sheets = {}
+row_counts = {}
+# Urgent rows go straight to their sheet; the rest are parked in a temp file
+# per type and appended at the end, keeping "Urgent first" inside each sheet.
+deferred = {}
 
-# Step 2: Classify emails
-classified_emails = []
-for idx, email in enumerate(emails, start=1):
-    result = classify_email(email)
-    classified_emails.append(result)
+def sheet_for(t):
+    if t not in sheets:
+        ws = wb.create_sheet(t.capitalize())
+        # Bold headers
+        header = []
+        for name in COLUMNS:
+            cell = WriteOnlyCell(ws, value=name)
+            cell.font = Font(bold=True)
+            header.append(cell)
+        ws.append(header)
+        sheets[t] = ws
+        row_counts[t] = 1
+        deferred[t] = tempfile.TemporaryFile("w+", newline="", encoding="utf-8")
+    return sheets[t]
+
+# Step 1 + 2: Fetch and classify emails, one at a time
+print("Fetching emails...")
+total = 0
+for idx, record in enumerate(iter_emails(n=EXPORT_N), start=1):
+    result = classify_email(record.to_dict())
+    total = idx
 
     print(f"\n--- Email {idx} ---")
     print(f"Subject: {result['subject']}")
@@ -22,36 +50,33 @@ for idx, email in enumerate(emails, start=1):
     print(f"Sentiment: {result['sentiment']}")
     print(f"Priority: {result['priority']}")
 
-# Step 3: Sorting order
-priority_order = {"Urgent": 0, "Not Urgent": 1}
+    # Step 3: Sorting order (Urgent first) + Step 4: split into sheets by type
+    if result["type"] not in TYPES:
+        continue
+    ws = sheet_for(result["type"])
+    row = [result.get(c) for c in COLUMNS]
+    if result["priority"] == "Urgent":
+        ws.append(row)
+    else:
+        csv.writer(deferred[result["type"]]).writerow(row)
+    row_counts[result["type"]] += 1
+print(f"Total emails fetched: {total}")
 
-# Step 4: Split into sheets by type
+# Step 5: Non-urgent rows, then autofilter over each sheet
 output_file = "emails.xlsx"
-with pd.ExcelWriter(output_file, engine="openpyxl") as writer:
-    for t in ["support", "query", "help", "request", "spam"]:
-        filtered = [e for e in classified_emails if e["type"] == t]
-        if not filtered:
-            continue
-
-        # Sort inside each type by priority
-        filtered.sort(key=lambda x: priority_order.get(x["priority"], 2))
-        df = pd.DataFrame(filtered)
-
-        # Write to sheet
-        df.to_excel(writer, sheet_name=t.capitalize(), index=False)
-
-# Step 5: Formatting headers (bold + autofilter)
-wb = load_workbook(output_file)
-for sheet in wb.sheetnames:
-    ws = wb[sheet]
-
-    # Bold headers
-    for cell in ws[1]:
-        cell.font = Font(bold=True)
-
-    # Add autofilter
-    ws.auto_filter.ref = ws.dimensions
+for t in TYPES:
+    if t not in sheets:
+        continue
+    ws = sheets[t]
+    f = deferred[t]
+    f.seek(0)
+    for row in csv.reader(f):
+        ws.append(row)
+    f.close()
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(COLUMNS))}{row_counts[t]}"
 
+if not sheets:
+    wb.create_sheet("Empty")
 wb.save(output_file)
 
 print(f"\n✅ Emails classified, sorted into sheets, and saved to {output_file}")
@@ -0,0 +1,112 @@
+# app/spool.py
+import mmap
+import os
+import sqlite3
+from datetime import datetime
+from typing import Iterator, Optional, Tuple
+
+# Raw RFC822 messages as fetched from IMAP, kept so history can be
+# re-classified without going back to the server.
+SPOOL_DIR = "spool"
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    msg_id TEXT PRIMARY KEY,        -- Message-ID (same key as emails.id)
+    segment INTEGER NOT NULL,       -- segment_<n>.dat
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    spooled_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_segment_offset ON messages (segment, offset);
+"""
+
+
+class Spool:
+    """
+    Append-only store of raw messages: fixed-size segment files holding the
+    bytes back to back, plus a SQLite index of (segment, offset, length) per
+    Message-ID. Appends are idempotent per Message-ID; reads mmap segments.
+    """
+
+    def __init__(self, path: str = SPOOL_DIR, segment_bytes: int = SEGMENT_BYTES):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        os.makedirs(path, exist_ok=True)
+        # reads may be driven from a pool's feeder thread
+        self.index = sqlite3.connect(os.path.join(path, "index.db"), check_same_thread=False)
+        self.index.execute("PRAGMA journal_mode=WAL")
+        self.index.execute("PRAGMA synchronous=NORMAL")
+        self.index.executescript(INDEX_SCHEMA)
+        self._segment = None
+        self._file = None
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"segment_{segment:06d}.dat")
+
+    def _writer(self, size: int):
+        if self._file is None:
+            row = self.index.execute("SELECT MAX(segment) FROM messages").fetchone()
+            self._segment = row[0] or 1
+            self._file = open(self._segment_path(self._segment), "ab")
+        if self._file.tell() and self._file.tell() + size > self.segment_bytes:
+            self._file.close()
+            self._segment += 1
+            self._file = open(self._segment_path(self._segment), "ab")
+        return self._file
+
+    def __contains__(self, msg_id: str) -> bool:
+        return self.index.execute("SELECT 1 FROM messages WHERE msg_id = ?", (msg_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.index.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def append(self, msg_id: str, raw: bytes) -> bool:
+        """Spool one raw message; returns False if the Message-ID is already stored."""
+        if not msg_id or msg_id in self:
+            return False
+        f = self._writer(len(raw))
+        offset = f.tell()
+        f.write(raw)
+        f.flush()  # bytes must be on disk before the index points at them
+        self.index.execute(
+            "INSERT INTO messages (msg_id, segment, offset, length, spooled_at) VALUES (?, ?, ?, ?, ?)",
+            (msg_id, self._segment, offset, len(raw), datetime.utcnow().isoformat()),
+        )
+        self.index.commit()
+        return True
+
+    def get(self, msg_id: str) -> Optional[bytes]:
+        row = self.index.execute("SELECT segment, offset, length FROM messages WHERE msg_id = ?", (msg_id,)).fetchone()
+        if not row:
+            return None
+        segment, offset, length = row
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def iter_messages(self) -> Iterator[Tuple[str, bytes]]:
+        """Yield (msg_id, raw) for every spooled message, in spool order."""
+        if self._file is not None:
+            self._file.flush()
+        segments = [r[0] for r in self.index.execute("SELECT DISTINCT segment FROM messages ORDER BY segment")]
+        for segment in segments:
+            rows = self.index.execute(
+                "SELECT msg_id, offset, length FROM messages WHERE segment = ? ORDER BY offset", (segment,)
+            ).fetchall()
+            with open(self._segment_path(segment), "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for msg_id, offset, length in rows:
+                    yield msg_id, mm[offset:offset + length]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,93 @@
+"""
+Peak RSS of a full-mailbox fetch as the mailbox grows: the old fetch (one
+FETCH per message, parsed dicts collected into a list) vs the chunked
+iterator (app.emails.stream.iter_messages). Each run
+happens in a fresh subprocess against a local IMAP stub serving synthetic
+messages.
+
+    python -m benchmarks.bench_fetch_memory --sizes 1000 5000 20000
+"""
+import argparse
+import imaplib
+import random
+import resource
+import subprocess
+import sys
+from email.message import EmailMessage
+from email.policy import SMTP
+
+from benchmarks.fixtures import synthetic_email
+from benchmarks.imap_stub import IMAPStub
+
+
+def _raw_message(n: int) -> bytes:
+    mail = synthetic_email(n, random.Random(n))
+    msg = EmailMessage()
+    msg["Message-ID"] = mail["id"]
+    msg["From"] = mail["sender"]
+    msg["Subject"] = mail["subject"]
+    msg["Date"] = mail["date"]
+    # pad to a realistic ~20 KB body (quoted history, footers...)
+    msg.set_content(mail["body"] + "\n" + "> earlier message in the thread\n" * 600)
+    return msg.as_bytes(policy=SMTP)
+
+
+def _fetch_list(imap, ids):
+    """The pre-streaming fetch_emails loop: one message at a time, into a list of dicts."""
+    from app.emails.stream import parse_message
+
+    mails = []
+    for mid in ids:
+        status, msg_data = imap.fetch(mid, "(RFC822)")
+        if status != "OK":
+            continue
+        mails.append(parse_message(msg_data[0][1], mid.decode()).to_dict())
+    return mails
+
+
+def _child(port: int, mode: str, max_bytes: int):
+    from app.emails.stream import iter_messages
+
+    imap = imaplib.IMAP4("127.0.0.1", port)
+    imap.login("bench", "bench")
+    imap.select("INBOX")
+    ids = imap.search(None, "ALL")[1][0].split()
+    if mode == "list":
+        count = len(_fetch_list(imap, ids))
+    else:
+        count = sum(1 for _ in iter_messages(imap, ids, max_bytes=max_bytes))
+    imap.logout()
+    # ru_maxrss is KiB on Linux
+    print(count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--max-chunk-mb", type=float, default=8)
+    parser.add_argument("--child", nargs=2, metavar=("PORT", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    max_bytes = int(args.max_chunk_mb * 1024 * 1024)
+
+    if args.child:
+        _child(int(args.child[0]), args.child[1], max_bytes)
+        return 0
+
+    print(f"{'messages':>9} {'list MB':>9} {'stream MB':>10}")
+    for size in args.sizes:
+        stub = IMAPStub(generate=_raw_message, generated_count=size)
+        peaks = []
+        for mode in ("list", "stream"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_fetch_memory", "--child", str(stub.port), mode,
+                 "--max-chunk-mb", str(args.max_chunk_mb)],
+                check=True, capture_output=True, text=True,
+            ).stdout.split()
+            peaks.append(int(out[1]))
+        stub.shutdown()
+        print(f"{size:>9} {peaks[0]:>9} {peaks[1]:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
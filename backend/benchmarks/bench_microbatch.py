@@ -0,0 +1,84 @@
+"""
+Throughput / latency of the inference MicroBatcher under concurrent
+clients, each sending single-email requests back to back.
+
+By default the model is simulated with a batch cost of
+`--fixed-ms + --per-item-ms * batch_size` (forward passes are dominated by
+per-call overhead at small batch sizes); `--real` runs extract_info_batch.
+
+    python -m benchmarks.bench_microbatch --clients 20 --requests 50
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from app.extraction.batching import MicroBatcher
+from benchmarks.fixtures import synthetic_emails
+
+
+def _simulated_model(fixed_ms: float, per_item_ms: float):
+    lock = threading.Lock()  # one model instance: calls are serialized
+
+    def run(batch):
+        with lock:
+            time.sleep((fixed_ms + per_item_ms * len(batch)) / 1000)
+        return [{"summary": "ok"} for _ in batch]
+    return run
+
+
+def _run(batch_fn, max_batch_size: int, max_wait_ms: float, clients: int, requests: int):
+    batcher = MicroBatcher(batch_fn, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    emails = list(synthetic_emails(clients * requests))
+    latencies = []
+    lock = threading.Lock()
+
+    def client(n):
+        for mail in emails[n * requests:(n + 1) * requests]:
+            started = time.perf_counter()
+            batcher.submit(mail).result()
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    stats = batcher.stats()
+    batcher.close()
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "mean_batch": stats["batch_size"]["sum"] / stats["batch_size"]["count"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--fixed-ms", type=float, default=40)
+    parser.add_argument("--per-item-ms", type=float, default=4)
+    parser.add_argument("--real", action="store_true", help="use the real extract_info_batch")
+    args = parser.parse_args()
+
+    if args.real:
+        from app.extraction.info_extract import extract_info_batch
+        batch_fn = extract_info_batch
+    else:
+        batch_fn = _simulated_model(args.fixed_ms, args.per_item_ms)
+
+    print(f"{'max_batch':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'avg batch':>9}")
+    for max_batch_size in (1, 4, 8, 16, 32):
+        r = _run(batch_fn, max_batch_size, args.max_wait_ms, args.clients, args.requests)
+        print(f"{max_batch_size:>9} {r['throughput']:>8.1f} {r['p50']:>8.1f} {r['p99']:>8.1f} {r['mean_batch']:>9.1f}")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,43 @@
+"""
+Scaling benchmark for ExtractionPool: regex + spaCy NER extraction over a
+synthetic fixture with 1..N worker processes.
+
+    python -m benchmarks.bench_parallel_extract --emails 10000 --max-workers 8
+"""
+import argparse
+import os
+import time
+
+from app.extraction.info_extract import extract_fields
+from app.extraction.parallel import ExtractionPool
+from benchmarks.fixtures import synthetic_emails
+
+
+def _extract(mail):
+    return extract_fields(f"{mail['subject']}\n{mail['body']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=10000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type=int, default=16)
+    args = parser.parse_args()
+
+    emails = list(synthetic_emails(args.emails))
+    baseline = None
+    print(f"{'workers':>7} {'seconds':>9} {'emails/s':>10} {'speedup':>8}")
+    counts = sorted({1, args.max_workers} | {2 ** i for i in range(args.max_workers.bit_length()) if 2 ** i <= args.max_workers})
+    for workers in counts:
+        started = time.perf_counter()
+        with ExtractionPool(workers, args.chunksize) as pool:
+            for _ in pool.imap(_extract, emails):
+                pass
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(f"{workers:>7} {elapsed:>9.2f} {len(emails) / elapsed:>10.1f} {baseline / elapsed:>8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
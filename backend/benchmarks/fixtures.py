@@ -0,0 +1,46 @@
+import random
+from typing import Dict, Iterator
+
+FIRST_NAMES = ["Alice", "Ravi", "Maria", "John", "Priya", "Chen", "Fatima", "Lucas"]
+LAST_NAMES = ["Sharma", "Smith", "Garcia", "Wang", "Khan", "Brown", "Silva"]
+SUBJECTS = [
+    "Support needed: cannot access account",
+    "Query about my last invoice",
+    "Request for refund on order",
+    "Help with password reset",
+    "Urgent: service down since morning",
+    "Question about delivery date",
+    "Weekly newsletter - top offers",
+]
+SENTENCES = [
+    "I have been trying to log in since yesterday but it keeps failing.",
+    "My order ID: ORD-{n} has not arrived yet.",
+    "You can reach me at +91 98{n:08d} or at {first}.{last}@example.com.",
+    "This is critical for our team, please respond asap.",
+    "The payment was made on 12/03/2025 but it still shows pending.",
+    "Could you clarify how the new pricing applies to existing plans?",
+    "Thanks for the quick help last time.",
+    "We are evaluating the product for {last} Corp and need access for five users.",
+]
+
+
+def synthetic_email(n: int, rng: random.Random) -> Dict:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    body = " ".join(
+        rng.choice(SENTENCES).format(n=n, first=first.lower(), last=last)
+        for _ in range(rng.randint(3, 12))
+    )
+    return {
+        "id": f"<bench-{n}@example.com>",
+        "subject": rng.choice(SUBJECTS),
+        "sender": f"{first} {last} <{first.lower()}.{last.lower()}@example.com>",
+        "date": "Mon, 06 Oct 2025 10:00:00 +0000",
+        "body": f"Hi Team, {body} Regards, {first} {last}",
+    }
+
+
+def synthetic_emails(count: int = 10000, seed: int = 0) -> Iterator[Dict]:
+    """Deterministic stream of realistic-looking support emails."""
+    rng = random.Random(seed)
+    for n in range(count):
+        yield synthetic_email(n, rng)
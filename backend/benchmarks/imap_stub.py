@@ -0,0 +1,115 @@
+"""
+Minimal in-process IMAP server for benchmarks: LOGIN, SELECT, SEARCH,
+FETCH (RFC822.SIZE, HEADER.FIELDS, RFC822), APPEND (synchronizing or LITERAL+
+literal) and
+LOGOUT, with an artificial per-response delay to stand in for network
+latency. The mailbox is either the appended messages or a read-only
+synthetic one generated on demand (so the stub itself stays small).
+"""
+import email
+import re
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Optional
+
+LITERAL = re.compile(rb"\{(\d+)(\+?)\}\r\n$")
+HEADER_FIELDS = re.compile(rb"HEADER\.FIELDS \(([^)]*)\)")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def send(self, line: bytes, delay: bool = True):
+        if delay and self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(line + b"\r\n")
+        self.wfile.flush()
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.send(b"* OK IMAP stub ready", delay=False)
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            tag, _, rest = line.rstrip(b"\r\n").partition(b" ")
+            command = rest.split(b" ", 1)[0].upper()
+            if command == b"CAPABILITY":
+                self.send(b"* CAPABILITY IMAP4rev1" + (b" LITERAL+" if self.server.literal_plus else b""))
+                self.send(tag + b" OK CAPABILITY completed", delay=False)
+            elif command == b"LOGIN":
+                self.send(tag + b" OK LOGIN completed")
+            elif command == b"SELECT":
+                self.send(b"* %d EXISTS" % self.server.count())
+                self.send(tag + b" OK [READ-WRITE] SELECT completed", delay=False)
+            elif command == b"SEARCH":
+                self.send(b"* SEARCH " + b" ".join(b"%d" % n for n in range(1, self.server.count() + 1)))
+                self.send(tag + b" OK SEARCH completed", delay=False)
+            elif command == b"FETCH":
+                _, seqs, items = rest.split(b" ", 2)
+                for n in _sequence_set(seqs, self.server.count()):
+                    raw = self.server.message(n)
+                    fields = HEADER_FIELDS.search(items)
+                    if fields:
+                        msg = email.message_from_bytes(raw)
+                        header = b"".join(b"%s: %s\r\n" % (name, msg[name.decode()].encode())
+                                          for name in fields.group(1).split() if msg[name.decode()]) + b"\r\n"
+                        size = b"RFC822.SIZE %d " % len(raw) if b"RFC822.SIZE" in items else b""
+                        self.wfile.write(b"* %d FETCH (%sBODY[HEADER.FIELDS (%s)] {%d}\r\n"
+                                         % (n, size, fields.group(1), len(header)) + header + b")\r\n")
+                    elif b"RFC822.SIZE" in items:
+                        self.wfile.write(b"* %d FETCH (RFC822.SIZE %d)\r\n" % (n, len(raw)))
+                    else:
+                        self.wfile.write(b"* %d FETCH (RFC822 {%d}\r\n" % (n, len(raw)) + raw + b")\r\n")
+                self.send(tag + b" OK FETCH completed")
+            elif command == b"APPEND":
+                literal = LITERAL.search(line)
+                size = int(literal.group(1))
+                if not literal.group(2):  # {n+} literals don't wait for a continuation
+                    self.send(b"+ Ready for literal data")
+                raw = self.rfile.read(size)
+                self.rfile.readline()  # CRLF ending the command
+                with self.server.lock:
+                    self.server.messages.append(raw)
+                self.send(tag + b" OK APPEND completed")
+            elif command == b"LOGOUT":
+                self.send(b"* BYE", delay=False)
+                self.send(tag + b" OK LOGOUT completed", delay=False)
+                return
+            else:
+                self.send(tag + b" BAD unknown command", delay=False)
+
+
+def _sequence_set(spec: bytes, count: int):
+    for part in spec.split(b","):
+        lo, _, hi = part.partition(b":")
+        lo = count if lo == b"*" else int(lo)
+        hi = lo if not hi else (count if hi == b"*" else int(hi))
+        yield from range(lo, hi + 1)
+
+
+class IMAPStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency: float = 0.0, generate: Optional[Callable[[int], bytes]] = None,
+                 generated_count: int = 0, literal_plus: bool = False):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.literal_plus = literal_plus
+        self.messages = []
+        self.generate = generate
+        self.generated_count = generated_count
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def count(self) -> int:
+        return self.generated_count if self.generate else len(self.messages)
+
+    def message(self, n: int) -> bytes:
+        """Message with sequence number n (1-based)."""
+        return self.generate(n) if self.generate else self.messages[n - 1]
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
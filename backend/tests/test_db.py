@@ -0,0 +1,55 @@
+import os
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from app import db
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", os.path.join(tmp_path, "emails.db"))
+    db.init_db()
+    return db
+
+
+def _days_ago(days):
+    return format_datetime(datetime.now(timezone.utc) - timedelta(days=days))
+
+
+def _page_through(db, limit):
+    seen, before = [], None
+    while True:
+        rows = db.list_emails(limit, ["id"], before)
+        seen.extend(r["id"] for r in rows)
+        if len(rows) < limit:
+            return seen
+        before = f"{rows[-1]['received_at']}|{rows[-1]['id']}"
+
+
+def test_list_emails_pages_backfilled_mail_in_received_order(fresh_db):
+    # current mail first, then a backfill of old-dated mail: received later,
+    # but stored in an older (message-date) partition
+    fresh_db.insert_email({"id": "<a>", "date": None})
+    fresh_db.insert_email({"id": "<b>", "date": _days_ago(60)})
+    fresh_db.insert_email({"id": "<c>", "date": _days_ago(59)})
+    assert len(fresh_db.list_partitions()) == 2
+
+    assert _page_through(fresh_db, 1) == ["<c>", "<b>", "<a>"]
+    assert _page_through(fresh_db, 2) == ["<c>", "<b>", "<a>"]
+
+
+def test_mail_past_retention_is_remembered_not_stored(fresh_db):
+    old = {"id": "<old>", "date": _days_ago(fresh_db.RETENTION_DAYS + 62)}
+    assert fresh_db.insert_email(old) is False
+    assert fresh_db.list_partitions() == []
+    assert fresh_db.email_exists("<old>")
+    assert fresh_db.stored_ids(["<old>", "<new>"]) == {"<old>"}
+
+
+def test_purged_ids_stay_known(fresh_db):
+    fresh_db.insert_email({"id": "<x>", "date": _days_ago(60)})
+    assert fresh_db.purge_partitions(retention_days=0)
+    assert fresh_db.email_exists("<x>")
+    assert fresh_db.insert_email({"id": "<x>", "date": _days_ago(60)}) is False